@@ -18,16 +18,20 @@ Census Variables:
   B03002_004E  Black alone (not Hispanic)
   B08303_001E  Total commuters (for avg commute calculation)
   B08013_001E  Aggregate travel time to work
+
+Counties whose API response is unchanged since the last run are not re-upserted;
+pass {"force_fetch": true} to reload regardless.
 """
 
+import asyncio
 import json
 import logging
 import urllib.error
-import urllib.request
 
+from shared.async_supabase_client import upsert
 from shared.config import BERGEN_FIPS, ESSEX_FIPS, FIPS_TO_ID, HUDSON_FIPS, STATE_FIPS
 from shared.logging_utils import lambda_handler_wrapper
-from shared.supabase_client import upsert
+from shared.source_cache import SourceCache
 
 logger = logging.getLogger(__name__)
 
@@ -48,8 +52,13 @@ VARIABLES = (
 )
 
 
-def fetch_county(year: int, county_fips: str) -> list[dict]:
-    """Fetch ACS data for all county subdivisions in a county."""
+def fetch_county(
+    year: int, county_fips: str, sources: SourceCache | None = None
+) -> list[dict] | None:
+    """
+    Fetch ACS data for all county subdivisions in a county, or None if the
+    response is unchanged in `sources`.
+    """
     url = (
         f"{ACS_BASE.format(year=year)}"
         f"?get={VARIABLES}"
@@ -57,14 +66,15 @@ def fetch_county(year: int, county_fips: str) -> list[dict]:
         f"&in=state:{STATE_FIPS}&in=county:{county_fips}"
     )
 
-    req = urllib.request.Request(url, headers={"User-Agent": "MiniAppETL/1.0"})
     try:
-        with urllib.request.urlopen(req, timeout=60) as resp:
-            data = json.loads(resp.read().decode("utf-8"))
+        body = (sources or SourceCache(force=True)).fetch(url, timeout=60)
     except urllib.error.HTTPError as e:
         logger.error(f"Census API error for county {county_fips}: {e.code}")
         return []
+    if body is None:
+        return None
 
+    data = json.loads(body.decode("utf-8"))
     if len(data) < 2:
         return []
 
@@ -148,28 +158,53 @@ def fetch_county(year: int, county_fips: str) -> list[dict]:
     return rows
 
 
+async def load_counties(year: int, sources: SourceCache) -> list[tuple[int, int] | None]:
+    """
+    Fetch the three counties concurrently and upsert each one as soon as it
+    arrives, so Census API latency overlaps with loading into Supabase.
+
+    Returns (rows fetched, rows upserted) per county, or None for a county
+    whose data is unchanged.
+    """
+
+    async def load(county_name: str, county_fips: str) -> tuple[int, int] | None:
+        rows = await asyncio.to_thread(fetch_county, year, county_fips, sources)
+        if rows is None:
+            logger.info(f"{county_name} County: unchanged since the last run")
+            return None
+        logger.info(f"{county_name} County: {len(rows)} towns matched")
+        result = await upsert("town_demographics", rows, on_conflict="town_id,year")
+        return len(rows), result["inserted"]
+
+    loaded = await asyncio.gather(
+        load("Bergen", BERGEN_FIPS),
+        load("Hudson", HUDSON_FIPS),
+        load("Essex", ESSEX_FIPS),
+    )
+    return list(loaded)
+
+
 @lambda_handler_wrapper
 def handler(event, context):
     # Allow overriding the ACS year via event payload
     year = event.get("year", 2023) if isinstance(event, dict) else 2023
+    force = bool(event.get("force_fetch", False)) if isinstance(event, dict) else False
+    sources = SourceCache(force=force)
 
     logger.info(f"Fetching Census ACS {year} data for 3 counties")
+    results = asyncio.run(load_counties(year, sources))
+    sources.commit()
 
-    all_rows = []
-    for county_name, county_fips in [
-        ("Bergen", BERGEN_FIPS),
-        ("Hudson", HUDSON_FIPS),
-        ("Essex", ESSEX_FIPS),
-    ]:
-        rows = fetch_county(year, county_fips)
-        logger.info(f"{county_name} County: {len(rows)} towns matched")
-        all_rows.extend(rows)
+    counts = [result for result in results if result is not None]
+    if not counts:
+        return {"year": year, "unchanged": True}
 
-    logger.info(f"Total: {len(all_rows)} town demographic records")
-    result = upsert("town_demographics", all_rows, on_conflict="town_id,year")
+    towns_fetched = sum(fetched for fetched, _ in counts)
+    logger.info(f"Total: {towns_fetched} town demographic records")
 
     return {
         "year": year,
-        "towns_fetched": len(all_rows),
-        "upserted": result["inserted"],
+        "towns_fetched": towns_fetched,
+        "upserted": sum(upserted for _, upserted in counts),
+        "counties_unchanged": len(results) - len(counts),
     }
@@ -10,14 +10,19 @@ Source: https://fred.stlouisfed.org/graph/fredgraph.csv
 FRED Series:
   - MORTGAGE30US: 30-Year Fixed Rate
   - MORTGAGE15US: 15-Year Fixed Rate
+
+Returns {"unchanged": true} without upserting when neither series has changed
+since the last run; pass {"force_fetch": true} to reload regardless.
 """
 
+import asyncio
 import csv
 import io
 import logging
 import urllib.request
 
 from shared.logging_utils import lambda_handler_wrapper
+from shared.source_cache import SourceCache
 from shared.supabase_client import upsert
 
 logger = logging.getLogger(__name__)
@@ -30,8 +35,19 @@ def fetch_fred_csv(url: str) -> dict[str, float]:
     """Fetch FRED CSV and return {date_str: rate} dict."""
     req = urllib.request.Request(url, headers={"User-Agent": "MiniAppETL/1.0"})
     with urllib.request.urlopen(req, timeout=30) as resp:
-        text = resp.read().decode("utf-8")
+        return parse_fred_csv(resp.read())
+
+
+def fetch_fred_changed(url: str, sources: SourceCache) -> dict[str, float] | None:
+    """Like fetch_fred_csv, but None if the series is unchanged in `sources`."""
+    body = sources.fetch(url, timeout=30)
+    if body is None:
+        return None
+    return parse_fred_csv(body)
+
 
+def parse_fred_csv(body: bytes) -> dict[str, float]:
+    text = body.decode("utf-8")
     rates = {}
     reader = csv.DictReader(io.StringIO(text))
     for row in reader:
@@ -46,15 +62,35 @@ def fetch_fred_csv(url: str) -> dict[str, float]:
     return rates
 
 
+async def fetch_both(
+    sources: SourceCache,
+) -> tuple[dict[str, float] | None, dict[str, float] | None]:
+    """Fetch the 30-year and 15-year series concurrently (None for an unchanged one)."""
+    rates_30yr, rates_15yr = await asyncio.gather(
+        asyncio.to_thread(fetch_fred_changed, FRED_30YR_URL, sources),
+        asyncio.to_thread(fetch_fred_changed, FRED_15YR_URL, sources),
+    )
+    return rates_30yr, rates_15yr
+
+
 @lambda_handler_wrapper
 def handler(event, context):
-    logger.info("Fetching 30-year mortgage rates from FRED")
-    rates_30yr = fetch_fred_csv(FRED_30YR_URL)
-    logger.info(f"Got {len(rates_30yr)} 30-year rate records")
-
-    logger.info("Fetching 15-year mortgage rates from FRED")
-    rates_15yr = fetch_fred_csv(FRED_15YR_URL)
-    logger.info(f"Got {len(rates_15yr)} 15-year rate records")
+    force = bool(event.get("force_fetch", False)) if isinstance(event, dict) else False
+    sources = SourceCache(force=force)
+
+    logger.info("Fetching 30-year and 15-year mortgage rates from FRED")
+    rates_30yr, rates_15yr = asyncio.run(fetch_both(sources))
+    if rates_30yr is None and rates_15yr is None:
+        logger.info("Neither FRED series changed since the last run, skipping upsert")
+        sources.commit()
+        return {"unchanged": True}
+
+    # Rows combine both series, so re-read the one that did not change
+    if rates_30yr is None:
+        rates_30yr = fetch_fred_csv(FRED_30YR_URL)
+    if rates_15yr is None:
+        rates_15yr = fetch_fred_csv(FRED_15YR_URL)
+    logger.info(f"Got {len(rates_30yr)} 30-year and {len(rates_15yr)} 15-year rate records")
 
     # Merge into rows by date
     all_dates = sorted(set(rates_30yr.keys()) | set(rates_15yr.keys()))
@@ -69,6 +105,7 @@ def handler(event, context):
 
     logger.info(f"Upserting {len(rows)} mortgage rate records")
     result = upsert("mortgage_rates", rows, on_conflict="date")
+    sources.commit()
 
     return {
         "dates_fetched": len(all_dates),
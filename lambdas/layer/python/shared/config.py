@@ -9,6 +9,11 @@ Each town entry contains:
   - place_fips: 5-digit county subdivision FIPS
   - redfin_names: List of name variants Redfin may use (e.g., "Teaneck Township")
   - zillow_name: City name as it appears in Zillow ZHVI CSVs (None if not in Zillow)
+  - zip_weights: USPS ZIP codes covering the town -> approximate share of the
+    town's homes in that ZIP (1.0 when the whole town is in one ZIP, even if
+    the ZIP also serves neighbours). Used to build town values from Zillow's
+    ZIP-level ZHVI; shares are from ZIP population estimates, so refresh them
+    if a ZIP is split or renumbered.
 """
 
 from typing import Any
@@ -32,6 +37,7 @@ TOWNS: list[Town] = [
         "place_fips": "00700",
         "redfin_names": ["Allendale"],
         "zillow_name": "Allendale",
+        "zip_weights": {"07401": 1.0},
     },
     {
         "id": "alpine",
@@ -41,6 +47,7 @@ TOWNS: list[Town] = [
         "place_fips": "01090",
         "redfin_names": ["Alpine"],
         "zillow_name": "Alpine",
+        "zip_weights": {"07620": 1.0},
     },
     {
         "id": "bergenfield",
@@ -50,6 +57,7 @@ TOWNS: list[Town] = [
         "place_fips": "05170",
         "redfin_names": ["Bergenfield"],
         "zillow_name": "Bergenfield",
+        "zip_weights": {"07621": 1.0},
     },
     {
         "id": "bogota",
@@ -59,6 +67,7 @@ TOWNS: list[Town] = [
         "place_fips": "06490",
         "redfin_names": ["Bogota"],
         "zillow_name": "Bogota",
+        "zip_weights": {"07603": 1.0},
     },
     {
         "id": "carlstadt",
@@ -68,6 +77,7 @@ TOWNS: list[Town] = [
         "place_fips": "10480",
         "redfin_names": ["Carlstadt"],
         "zillow_name": "Carlstadt",
+        "zip_weights": {"07072": 1.0},
     },
     {
         "id": "cliffside_park",
@@ -77,6 +87,7 @@ TOWNS: list[Town] = [
         "place_fips": "13570",
         "redfin_names": ["Cliffside Park"],
         "zillow_name": "Cliffside Park",
+        "zip_weights": {"07010": 1.0},
     },
     {
         "id": "closter",
@@ -86,6 +97,7 @@ TOWNS: list[Town] = [
         "place_fips": "13810",
         "redfin_names": ["Closter"],
         "zillow_name": "Closter",
+        "zip_weights": {"07624": 1.0},
     },
     {
         "id": "cresskill",
@@ -95,6 +107,7 @@ TOWNS: list[Town] = [
         "place_fips": "15820",
         "redfin_names": ["Cresskill"],
         "zillow_name": "Cresskill",
+        "zip_weights": {"07626": 1.0},
     },
     {
         "id": "demarest",
@@ -104,6 +117,7 @@ TOWNS: list[Town] = [
         "place_fips": "17530",
         "redfin_names": ["Demarest"],
         "zillow_name": "Demarest",
+        "zip_weights": {"07627": 1.0},
     },
     {
         "id": "dumont",
@@ -113,6 +127,7 @@ TOWNS: list[Town] = [
         "place_fips": "18400",
         "redfin_names": ["Dumont"],
         "zillow_name": "Dumont",
+        "zip_weights": {"07628": 1.0},
     },
     {
         "id": "east_rutherford",
@@ -122,6 +137,7 @@ TOWNS: list[Town] = [
         "place_fips": "19510",
         "redfin_names": ["East Rutherford"],
         "zillow_name": "East Rutherford",
+        "zip_weights": {"07073": 1.0},
     },
     {
         "id": "edgewater",
@@ -131,6 +147,7 @@ TOWNS: list[Town] = [
         "place_fips": "20020",
         "redfin_names": ["Edgewater"],
         "zillow_name": "Edgewater",
+        "zip_weights": {"07020": 1.0},
     },
     {
         "id": "elmwood_park",
@@ -140,6 +157,7 @@ TOWNS: list[Town] = [
         "place_fips": "21300",
         "redfin_names": ["Elmwood Park"],
         "zillow_name": "Elmwood Park",
+        "zip_weights": {"07407": 1.0},
     },
     {
         "id": "emerson",
@@ -149,6 +167,7 @@ TOWNS: list[Town] = [
         "place_fips": "21450",
         "redfin_names": ["Emerson"],
         "zillow_name": "Emerson",
+        "zip_weights": {"07630": 1.0},
     },
     {
         "id": "englewood",
@@ -158,6 +177,7 @@ TOWNS: list[Town] = [
         "place_fips": "21480",
         "redfin_names": ["Englewood"],
         "zillow_name": "Englewood",
+        "zip_weights": {"07631": 1.0},
     },
     {
         "id": "englewood_cliffs",
@@ -167,6 +187,7 @@ TOWNS: list[Town] = [
         "place_fips": "21510",
         "redfin_names": ["Englewood Cliffs"],
         "zillow_name": "Englewood Cliffs",
+        "zip_weights": {"07632": 1.0},
     },
     {
         "id": "fair_lawn",
@@ -176,6 +197,7 @@ TOWNS: list[Town] = [
         "place_fips": "22470",
         "redfin_names": ["Fair Lawn"],
         "zillow_name": "Fair Lawn",
+        "zip_weights": {"07410": 1.0},
     },
     {
         "id": "fairview",
@@ -185,6 +207,7 @@ TOWNS: list[Town] = [
         "place_fips": "22560",
         "redfin_names": ["Fairview"],
         "zillow_name": "Fairview",
+        "zip_weights": {"07022": 1.0},
     },
     {
         "id": "fort_lee",
@@ -194,6 +217,7 @@ TOWNS: list[Town] = [
         "place_fips": "24420",
         "redfin_names": ["Fort Lee"],
         "zillow_name": "Fort Lee",
+        "zip_weights": {"07024": 1.0},
     },
     {
         "id": "franklin_lakes",
@@ -203,6 +227,7 @@ TOWNS: list[Town] = [
         "place_fips": "24990",
         "redfin_names": ["Franklin Lakes"],
         "zillow_name": "Franklin Lakes",
+        "zip_weights": {"07417": 1.0},
     },
     {
         "id": "garfield",
@@ -212,6 +237,7 @@ TOWNS: list[Town] = [
         "place_fips": "25770",
         "redfin_names": ["Garfield"],
         "zillow_name": "Garfield",
+        "zip_weights": {"07026": 1.0},
     },
     {
         "id": "glen_rock",
@@ -221,6 +247,7 @@ TOWNS: list[Town] = [
         "place_fips": "26640",
         "redfin_names": ["Glen Rock"],
         "zillow_name": "Glen Rock",
+        "zip_weights": {"07452": 1.0},
     },
     {
         "id": "hackensack",
@@ -230,6 +257,7 @@ TOWNS: list[Town] = [
         "place_fips": "28680",
         "redfin_names": ["Hackensack"],
         "zillow_name": "Hackensack",
+        "zip_weights": {"07601": 1.0},
     },
     {
         "id": "harrington_park",
@@ -239,6 +267,7 @@ TOWNS: list[Town] = [
         "place_fips": "30150",
         "redfin_names": ["Harrington Park"],
         "zillow_name": "Harrington Park",
+        "zip_weights": {"07640": 1.0},
     },
     {
         "id": "hasbrouck_heights",
@@ -248,6 +277,7 @@ TOWNS: list[Town] = [
         "place_fips": "30420",
         "redfin_names": ["Hasbrouck Heights"],
         "zillow_name": "Hasbrouck Heights",
+        "zip_weights": {"07604": 1.0},
     },
     {
         "id": "haworth",
@@ -257,6 +287,7 @@ TOWNS: list[Town] = [
         "place_fips": "30540",
         "redfin_names": ["Haworth"],
         "zillow_name": "Haworth",
+        "zip_weights": {"07641": 1.0},
     },
     {
         "id": "hillsdale",
@@ -266,6 +297,7 @@ TOWNS: list[Town] = [
         "place_fips": "31920",
         "redfin_names": ["Hillsdale"],
         "zillow_name": "Hillsdale",
+        "zip_weights": {"07642": 1.0},
     },
     {
         "id": "ho_ho_kus",
@@ -275,6 +307,7 @@ TOWNS: list[Town] = [
         "place_fips": "32310",
         "redfin_names": ["Ho-Ho-Kus", "Ho Ho Kus"],
         "zillow_name": "Ho-Ho-Kus",
+        "zip_weights": {"07423": 1.0},
     },
     {
         "id": "leonia",
@@ -284,6 +317,7 @@ TOWNS: list[Town] = [
         "place_fips": "40020",
         "redfin_names": ["Leonia"],
         "zillow_name": "Leonia",
+        "zip_weights": {"07605": 1.0},
     },
     {
         "id": "little_ferry",
@@ -293,6 +327,7 @@ TOWNS: list[Town] = [
         "place_fips": "40680",
         "redfin_names": ["Little Ferry"],
         "zillow_name": "Little Ferry",
+        "zip_weights": {"07643": 1.0},
     },
     {
         "id": "lodi",
@@ -302,6 +337,7 @@ TOWNS: list[Town] = [
         "place_fips": "41100",
         "redfin_names": ["Lodi"],
         "zillow_name": "Lodi",
+        "zip_weights": {"07644": 1.0},
     },
     {
         "id": "lyndhurst",
@@ -311,6 +347,7 @@ TOWNS: list[Town] = [
         "place_fips": "42090",
         "redfin_names": ["Lyndhurst", "Lyndhurst Township"],
         "zillow_name": "Lyndhurst",
+        "zip_weights": {"07071": 1.0},
     },
     {
         "id": "mahwah",
@@ -320,6 +357,7 @@ TOWNS: list[Town] = [
         "place_fips": "42750",
         "redfin_names": ["Mahwah", "Mahwah Township"],
         "zillow_name": "Mahwah",
+        "zip_weights": {"07430": 1.0},
     },
     {
         "id": "maywood",
@@ -329,6 +367,7 @@ TOWNS: list[Town] = [
         "place_fips": "44880",
         "redfin_names": ["Maywood"],
         "zillow_name": "Maywood",
+        "zip_weights": {"07607": 1.0},
     },
     {
         "id": "midland_park",
@@ -338,6 +377,7 @@ TOWNS: list[Town] = [
         "place_fips": "46110",
         "redfin_names": ["Midland Park"],
         "zillow_name": "Midland Park",
+        "zip_weights": {"07432": 1.0},
     },
     {
         "id": "montvale",
@@ -347,6 +387,7 @@ TOWNS: list[Town] = [
         "place_fips": "47610",
         "redfin_names": ["Montvale"],
         "zillow_name": "Montvale",
+        "zip_weights": {"07645": 1.0},
     },
     {
         "id": "moonachie",
@@ -356,6 +397,7 @@ TOWNS: list[Town] = [
         "place_fips": "47700",
         "redfin_names": ["Moonachie"],
         "zillow_name": "Moonachie",
+        "zip_weights": {"07074": 1.0},
     },
     {
         "id": "new_milford",
@@ -365,6 +407,7 @@ TOWNS: list[Town] = [
         "place_fips": "51660",
         "redfin_names": ["New Milford"],
         "zillow_name": "New Milford",
+        "zip_weights": {"07646": 1.0},
     },
     {
         "id": "north_arlington",
@@ -374,6 +417,7 @@ TOWNS: list[Town] = [
         "place_fips": "52320",
         "redfin_names": ["North Arlington"],
         "zillow_name": "North Arlington",
+        "zip_weights": {"07031": 1.0},
     },
     {
         "id": "northvale",
@@ -383,6 +427,7 @@ TOWNS: list[Town] = [
         "place_fips": "53430",
         "redfin_names": ["Northvale"],
         "zillow_name": "Northvale",
+        "zip_weights": {"07647": 1.0},
     },
     {
         "id": "norwood",
@@ -392,6 +437,7 @@ TOWNS: list[Town] = [
         "place_fips": "53610",
         "redfin_names": ["Norwood"],
         "zillow_name": "Norwood",
+        "zip_weights": {"07648": 1.0},
     },
     {
         "id": "oakland",
@@ -401,6 +447,7 @@ TOWNS: list[Town] = [
         "place_fips": "53850",
         "redfin_names": ["Oakland"],
         "zillow_name": "Oakland",
+        "zip_weights": {"07436": 1.0},
     },
     {
         "id": "old_tappan",
@@ -410,6 +457,7 @@ TOWNS: list[Town] = [
         "place_fips": "54870",
         "redfin_names": ["Old Tappan"],
         "zillow_name": "Old Tappan",
+        "zip_weights": {"07675": 1.0},
     },
     {
         "id": "oradell",
@@ -419,6 +467,7 @@ TOWNS: list[Town] = [
         "place_fips": "54990",
         "redfin_names": ["Oradell"],
         "zillow_name": "Oradell",
+        "zip_weights": {"07649": 1.0},
     },
     {
         "id": "palisades_park",
@@ -428,6 +477,7 @@ TOWNS: list[Town] = [
         "place_fips": "55770",
         "redfin_names": ["Palisades Park"],
         "zillow_name": "Palisades Park",
+        "zip_weights": {"07650": 1.0},
     },
     {
         "id": "paramus",
@@ -437,6 +487,7 @@ TOWNS: list[Town] = [
         "place_fips": "55950",
         "redfin_names": ["Paramus"],
         "zillow_name": "Paramus",
+        "zip_weights": {"07652": 1.0},
     },
     {
         "id": "park_ridge",
@@ -446,6 +497,7 @@ TOWNS: list[Town] = [
         "place_fips": "56130",
         "redfin_names": ["Park Ridge"],
         "zillow_name": "Park Ridge",
+        "zip_weights": {"07656": 1.0},
     },
     {
         "id": "ramsey",
@@ -455,6 +507,7 @@ TOWNS: list[Town] = [
         "place_fips": "61680",
         "redfin_names": ["Ramsey"],
         "zillow_name": "Ramsey",
+        "zip_weights": {"07446": 1.0},
     },
     {
         "id": "ridgefield",
@@ -464,6 +517,7 @@ TOWNS: list[Town] = [
         "place_fips": "62910",
         "redfin_names": ["Ridgefield"],
         "zillow_name": "Ridgefield",
+        "zip_weights": {"07657": 1.0},
     },
     {
         "id": "ridgefield_park",
@@ -473,6 +527,7 @@ TOWNS: list[Town] = [
         "place_fips": "62940",
         "redfin_names": ["Ridgefield Park"],
         "zillow_name": "Ridgefield Park",
+        "zip_weights": {"07660": 1.0},
     },
     {
         "id": "ridgewood",
@@ -482,6 +537,7 @@ TOWNS: list[Town] = [
         "place_fips": "63000",
         "redfin_names": ["Ridgewood"],
         "zillow_name": "Ridgewood",
+        "zip_weights": {"07450": 1.0},
     },
     {
         "id": "river_edge",
@@ -491,6 +547,7 @@ TOWNS: list[Town] = [
         "place_fips": "63360",
         "redfin_names": ["River Edge"],
         "zillow_name": "River Edge",
+        "zip_weights": {"07661": 1.0},
     },
     {
         "id": "river_vale",
@@ -500,6 +557,7 @@ TOWNS: list[Town] = [
         "place_fips": "63690",
         "redfin_names": ["River Vale", "River Vale Township"],
         "zillow_name": "River Vale",
+        "zip_weights": {"07675": 1.0},
     },
     {
         "id": "rochelle_park",
@@ -509,6 +567,7 @@ TOWNS: list[Town] = [
         "place_fips": "63990",
         "redfin_names": ["Rochelle Park"],
         "zillow_name": "Rochelle Park",
+        "zip_weights": {"07662": 1.0},
     },
     {
         "id": "rockleigh",
@@ -518,6 +577,7 @@ TOWNS: list[Town] = [
         "place_fips": "64170",
         "redfin_names": ["Rockleigh"],
         "zillow_name": None,
+        "zip_weights": {"07647": 1.0},
     },
     {
         "id": "rutherford",
@@ -527,6 +587,7 @@ TOWNS: list[Town] = [
         "place_fips": "65280",
         "redfin_names": ["Rutherford"],
         "zillow_name": "Rutherford",
+        "zip_weights": {"07070": 1.0},
     },
     {
         "id": "saddle_brook",
@@ -536,6 +597,7 @@ TOWNS: list[Town] = [
         "place_fips": "65340",
         "redfin_names": ["Saddle Brook", "Saddle Brook Township"],
         "zillow_name": "Saddle Brook",
+        "zip_weights": {"07663": 1.0},
     },
     {
         "id": "saddle_river",
@@ -545,6 +607,7 @@ TOWNS: list[Town] = [
         "place_fips": "65400",
         "redfin_names": ["Saddle River"],
         "zillow_name": "Saddle River",
+        "zip_weights": {"07458": 1.0},
     },
     {
         "id": "south_hackensack",
@@ -554,6 +617,7 @@ TOWNS: list[Town] = [
         "place_fips": "68970",
         "redfin_names": ["South Hackensack"],
         "zillow_name": None,
+        "zip_weights": {"07606": 1.0},
     },
     {
         "id": "teaneck",
@@ -563,6 +627,7 @@ TOWNS: list[Town] = [
         "place_fips": "72360",
         "redfin_names": ["Teaneck", "Teaneck Township"],
         "zillow_name": "Teaneck",
+        "zip_weights": {"07666": 1.0},
     },
     {
         "id": "tenafly",
@@ -572,6 +637,7 @@ TOWNS: list[Town] = [
         "place_fips": "72420",
         "redfin_names": ["Tenafly"],
         "zillow_name": "Tenafly",
+        "zip_weights": {"07670": 1.0},
     },
     {
         "id": "teterboro",
@@ -581,6 +647,7 @@ TOWNS: list[Town] = [
         "place_fips": "72480",
         "redfin_names": ["Teterboro"],
         "zillow_name": None,
+        "zip_weights": {"07608": 1.0},
     },
     {
         "id": "upper_saddle_river",
@@ -590,6 +657,7 @@ TOWNS: list[Town] = [
         "place_fips": "75140",
         "redfin_names": ["Upper Saddle River"],
         "zillow_name": "Upper Saddle River",
+        "zip_weights": {"07458": 1.0},
     },
     {
         "id": "waldwick",
@@ -599,6 +667,7 @@ TOWNS: list[Town] = [
         "place_fips": "76400",
         "redfin_names": ["Waldwick"],
         "zillow_name": "Waldwick",
+        "zip_weights": {"07463": 1.0},
     },
     {
         "id": "wallington",
@@ -608,6 +677,7 @@ TOWNS: list[Town] = [
         "place_fips": "76490",
         "redfin_names": ["Wallington"],
         "zillow_name": "Wallington",
+        "zip_weights": {"07057": 1.0},
     },
     {
         "id": "washington_twp_bergen",
@@ -617,6 +687,7 @@ TOWNS: list[Town] = [
         "place_fips": "77135",
         "redfin_names": ["Washington Township"],
         "zillow_name": None,
+        "zip_weights": {"07676": 1.0},
     },
     {
         "id": "westwood",
@@ -626,6 +697,7 @@ TOWNS: list[Town] = [
         "place_fips": "80270",
         "redfin_names": ["Westwood"],
         "zillow_name": "Westwood",
+        "zip_weights": {"07675": 1.0},
     },
     {
         "id": "woodcliff_lake",
@@ -635,6 +707,7 @@ TOWNS: list[Town] = [
         "place_fips": "82300",
         "redfin_names": ["Woodcliff Lake"],
         "zillow_name": "Woodcliff Lake",
+        "zip_weights": {"07677": 1.0},
     },
     {
         "id": "wood_ridge",
@@ -644,6 +717,7 @@ TOWNS: list[Town] = [
         "place_fips": "82570",
         "redfin_names": ["Wood-Ridge", "Wood Ridge"],
         "zillow_name": "Wood-Ridge",
+        "zip_weights": {"07075": 1.0},
     },
     {
         "id": "wyckoff",
@@ -653,6 +727,7 @@ TOWNS: list[Town] = [
         "place_fips": "83050",
         "redfin_names": ["Wyckoff", "Wyckoff Township"],
         "zillow_name": "Wyckoff",
+        "zip_weights": {"07481": 1.0},
     },
     # ── Hudson County (12) ──────────────────────────────────────────────
     {
@@ -663,6 +738,7 @@ TOWNS: list[Town] = [
         "place_fips": "03580",
         "redfin_names": ["Bayonne"],
         "zillow_name": "Bayonne",
+        "zip_weights": {"07002": 1.0},
     },
     {
         "id": "east_newark",
@@ -672,6 +748,7 @@ TOWNS: list[Town] = [
         "place_fips": "19360",
         "redfin_names": ["East Newark"],
         "zillow_name": None,
+        "zip_weights": {"07029": 1.0},
     },
     {
         "id": "guttenberg",
@@ -681,6 +758,7 @@ TOWNS: list[Town] = [
         "place_fips": "28650",
         "redfin_names": ["Guttenberg"],
         "zillow_name": "Guttenberg",
+        "zip_weights": {"07093": 1.0},
     },
     {
         "id": "harrison",
@@ -690,6 +768,7 @@ TOWNS: list[Town] = [
         "place_fips": "30210",
         "redfin_names": ["Harrison"],
         "zillow_name": "Harrison",
+        "zip_weights": {"07029": 1.0},
     },
     {
         "id": "hoboken",
@@ -699,6 +778,7 @@ TOWNS: list[Town] = [
         "place_fips": "32250",
         "redfin_names": ["Hoboken"],
         "zillow_name": "Hoboken",
+        "zip_weights": {"07030": 1.0},
     },
     {
         "id": "jersey_city",
@@ -708,6 +788,15 @@ TOWNS: list[Town] = [
         "place_fips": "36000",
         "redfin_names": ["Jersey City"],
         "zillow_name": "Jersey City",
+        "zip_weights": {
+            "07302": 0.17,
+            "07304": 0.16,
+            "07305": 0.24,
+            "07306": 0.2,
+            "07307": 0.16,
+            "07310": 0.06,
+            "07311": 0.01,
+        },
     },
     {
         "id": "kearny",
@@ -717,6 +806,7 @@ TOWNS: list[Town] = [
         "place_fips": "36510",
         "redfin_names": ["Kearny", "Kearny Town"],
         "zillow_name": "Kearny",
+        "zip_weights": {"07032": 1.0},
     },
     {
         "id": "north_bergen",
@@ -726,6 +816,7 @@ TOWNS: list[Town] = [
         "place_fips": "52470",
         "redfin_names": ["North Bergen", "North Bergen Township"],
         "zillow_name": "North Bergen",
+        "zip_weights": {"07047": 1.0},
     },
     {
         "id": "secaucus",
@@ -735,6 +826,7 @@ TOWNS: list[Town] = [
         "place_fips": "66570",
         "redfin_names": ["Secaucus"],
         "zillow_name": "Secaucus",
+        "zip_weights": {"07094": 1.0},
     },
     {
         "id": "union_city",
@@ -744,6 +836,7 @@ TOWNS: list[Town] = [
         "place_fips": "74630",
         "redfin_names": ["Union City"],
         "zillow_name": "Union City",
+        "zip_weights": {"07087": 1.0},
     },
     {
         "id": "weehawken",
@@ -753,6 +846,7 @@ TOWNS: list[Town] = [
         "place_fips": "77930",
         "redfin_names": ["Weehawken", "Weehawken Township"],
         "zillow_name": "Weehawken",
+        "zip_weights": {"07086": 1.0},
     },
     {
         "id": "west_new_york",
@@ -762,6 +856,7 @@ TOWNS: list[Town] = [
         "place_fips": "79610",
         "redfin_names": ["West New York"],
         "zillow_name": "West New York",
+        "zip_weights": {"07093": 1.0},
     },
     # ── Essex County (22) ───────────────────────────────────────────────
     {
@@ -772,6 +867,7 @@ TOWNS: list[Town] = [
         "place_fips": "04695",
         "redfin_names": ["Belleville", "Belleville Township"],
         "zillow_name": "Belleville",
+        "zip_weights": {"07109": 1.0},
     },
     {
         "id": "bloomfield",
@@ -781,6 +877,7 @@ TOWNS: list[Town] = [
         "place_fips": "06260",
         "redfin_names": ["Bloomfield", "Bloomfield Township"],
         "zillow_name": "Bloomfield",
+        "zip_weights": {"07003": 1.0},
     },
     {
         "id": "caldwell",
@@ -790,6 +887,7 @@ TOWNS: list[Town] = [
         "place_fips": "09250",
         "redfin_names": ["Caldwell"],
         "zillow_name": "Caldwell",
+        "zip_weights": {"07006": 1.0},
     },
     {
         "id": "cedar_grove",
@@ -799,6 +897,7 @@ TOWNS: list[Town] = [
         "place_fips": "11200",
         "redfin_names": ["Cedar Grove", "Cedar Grove Township"],
         "zillow_name": "Cedar Grove",
+        "zip_weights": {"07009": 1.0},
     },
     {
         "id": "city_of_orange",
@@ -808,6 +907,7 @@ TOWNS: list[Town] = [
         "place_fips": "13045",
         "redfin_names": ["Orange", "City of Orange Township", "City of Orange"],
         "zillow_name": "Orange",
+        "zip_weights": {"07050": 1.0},
     },
     {
         "id": "east_orange",
@@ -817,6 +917,7 @@ TOWNS: list[Town] = [
         "place_fips": "19390",
         "redfin_names": ["East Orange"],
         "zillow_name": "East Orange",
+        "zip_weights": {"07017": 0.51, "07018": 0.49},
     },
     {
         "id": "essex_fells",
@@ -826,6 +927,7 @@ TOWNS: list[Town] = [
         "place_fips": "21840",
         "redfin_names": ["Essex Fells"],
         "zillow_name": "Essex Fells",
+        "zip_weights": {"07021": 1.0},
     },
     {
         "id": "fairfield_essex",
@@ -835,6 +937,7 @@ TOWNS: list[Town] = [
         "place_fips": "22385",
         "redfin_names": ["Fairfield"],
         "zillow_name": None,
+        "zip_weights": {"07004": 1.0},
     },
     {
         "id": "glen_ridge",
@@ -844,6 +947,7 @@ TOWNS: list[Town] = [
         "place_fips": "26610",
         "redfin_names": ["Glen Ridge"],
         "zillow_name": "Glen Ridge",
+        "zip_weights": {"07028": 1.0},
     },
     {
         "id": "irvington",
@@ -853,6 +957,7 @@ TOWNS: list[Town] = [
         "place_fips": "34450",
         "redfin_names": ["Irvington", "Irvington Township"],
         "zillow_name": "Irvington",
+        "zip_weights": {"07111": 1.0},
     },
     {
         "id": "livingston",
@@ -862,6 +967,7 @@ TOWNS: list[Town] = [
         "place_fips": "40890",
         "redfin_names": ["Livingston", "Livingston Township"],
         "zillow_name": "Livingston",
+        "zip_weights": {"07039": 1.0},
     },
     {
         "id": "maplewood",
@@ -871,6 +977,7 @@ TOWNS: list[Town] = [
         "place_fips": "43800",
         "redfin_names": ["Maplewood", "Maplewood Township"],
         "zillow_name": "Maplewood",
+        "zip_weights": {"07040": 1.0},
     },
     {
         "id": "millburn",
@@ -880,6 +987,7 @@ TOWNS: list[Town] = [
         "place_fips": "46380",
         "redfin_names": ["Millburn", "Millburn Township", "Short Hills"],
         "zillow_name": "Millburn",
+        "zip_weights": {"07041": 0.36, "07078": 0.64},
     },
     {
         "id": "montclair",
@@ -889,6 +997,7 @@ TOWNS: list[Town] = [
         "place_fips": "47500",
         "redfin_names": ["Montclair", "Montclair Township"],
         "zillow_name": "Montclair",
+        "zip_weights": {"07042": 0.66, "07043": 0.34},
     },
     {
         "id": "newark",
@@ -898,6 +1007,17 @@ TOWNS: list[Town] = [
         "place_fips": "51000",
         "redfin_names": ["Newark"],
         "zillow_name": "Newark",
+        "zip_weights": {
+            "07102": 0.05,
+            "07103": 0.12,
+            "07104": 0.18,
+            "07105": 0.18,
+            "07106": 0.12,
+            "07107": 0.13,
+            "07108": 0.08,
+            "07112": 0.09,
+            "07114": 0.05,
+        },
     },
     {
         "id": "north_caldwell",
@@ -907,6 +1027,7 @@ TOWNS: list[Town] = [
         "place_fips": "52620",
         "redfin_names": ["North Caldwell"],
         "zillow_name": "North Caldwell",
+        "zip_weights": {"07006": 1.0},
     },
     {
         "id": "nutley",
@@ -916,6 +1037,7 @@ TOWNS: list[Town] = [
         "place_fips": "53680",
         "redfin_names": ["Nutley", "Nutley Township"],
         "zillow_name": "Nutley",
+        "zip_weights": {"07110": 1.0},
     },
     {
         "id": "roseland",
@@ -925,6 +1047,7 @@ TOWNS: list[Town] = [
         "place_fips": "64590",
         "redfin_names": ["Roseland"],
         "zillow_name": "Roseland",
+        "zip_weights": {"07068": 1.0},
     },
     {
         "id": "south_orange",
@@ -934,6 +1057,7 @@ TOWNS: list[Town] = [
         "place_fips": "69274",
         "redfin_names": ["South Orange", "South Orange Village"],
         "zillow_name": "South Orange",
+        "zip_weights": {"07079": 1.0},
     },
     {
         "id": "verona",
@@ -943,6 +1067,7 @@ TOWNS: list[Town] = [
         "place_fips": "75815",
         "redfin_names": ["Verona"],
         "zillow_name": "Verona",
+        "zip_weights": {"07044": 1.0},
     },
     {
         "id": "west_caldwell",
@@ -952,6 +1077,7 @@ TOWNS: list[Town] = [
         "place_fips": "78510",
         "redfin_names": ["West Caldwell", "West Caldwell Township"],
         "zillow_name": "West Caldwell",
+        "zip_weights": {"07006": 1.0},
     },
     {
         "id": "west_orange",
@@ -961,6 +1087,7 @@ TOWNS: list[Town] = [
         "place_fips": "79800",
         "redfin_names": ["West Orange", "West Orange Township"],
         "zillow_name": "West Orange",
+        "zip_weights": {"07052": 1.0},
     },
 ]
 
@@ -975,12 +1102,29 @@ for t in TOWNS:
     for name in t["redfin_names"]:
         REDFIN_NAME_TO_ID[name.lower()] = t["id"]
 
+# Redfin regions: region name -> {(STATE_CODE, city name lowered): town_id}.
+# The Redfin Lambda routes rows for every region from one pass over the
+# national file; add a region here (with its towns in TOWNS) to ingest it.
+REDFIN_REGIONS: dict[str, dict[tuple[str, str], str]] = {
+    "nj": {("NJ", name): town_id for name, town_id in REDFIN_NAME_TO_ID.items()},
+}
+
 # Zillow city name (lowered) -> town_id
 ZILLOW_NAME_TO_ID = {}
 for t in TOWNS:
     if t["zillow_name"]:
         ZILLOW_NAME_TO_ID[t["zillow_name"].lower()] = t["id"]
 
+# ZIP code -> ((town_id, share of the town's homes in that ZIP), ...)
+ZIP_TO_TOWNS: dict[str, tuple[tuple[str, float], ...]] = {}
+for t in TOWNS:
+    for zip_code, weight in t["zip_weights"].items():
+        ZIP_TO_TOWNS[zip_code] = (*ZIP_TO_TOWNS.get(zip_code, ()), (t["id"], weight))
+
+# Towns missing from Zillow's city-level files; their ZHVI is aggregated from
+# the ZIP-level file instead
+ZILLOW_ZIP_TOWN_IDS = frozenset(t["id"] for t in TOWNS if not t["zillow_name"])
+
 # Census FIPS (county_fips + place_fips) -> town_id
 FIPS_TO_ID = {}
 for t in TOWNS:
@@ -0,0 +1,207 @@
+"""
+Bounded-memory, last-wins deduplication of parsed rows.
+
+Rows are packed into fixed-width records: string columns become interned
+4-byte codes and numeric columns 8-byte doubles, about 240 bytes per row in
+memory against ~1.6KB for a dict. Past the memory budget the in-memory rows
+are sorted by key and spilled to a run file in /tmp; finish() merges the runs
+(a later row still replaces an earlier one with the same key), so peak memory
+stays flat however many regions feed the deduper.
+
+    deduper = SpillingDeduper(columns, key=("town_id", "date"), strings=(...))
+    for row in parsed:
+        deduper.add(row)            # tuple in `columns` order
+    deduper.finish()
+    for row in deduper: ...         # dicts; may be iterated more than once
+    deduper.close()
+"""
+
+import heapq
+import logging
+import math
+import os
+import shutil
+import struct
+import tempfile
+from collections.abc import Iterable, Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+SPILL_DIR = os.environ.get("ETL_SPILL_DIR", tempfile.gettempdir())
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+
+# Python object and dict-slot overhead per in-memory entry, beyond the record
+_ENTRY_OVERHEAD = 120
+_READ_RECORDS = 4096
+
+
+class SpillingDeduper:
+    """
+    Keep the last row per key, spilling sorted runs to disk over a memory budget.
+
+    Args:
+        columns: Column names, in the order of the row tuples passed to add()
+            and of the dicts yielded
+        key: Columns identifying a row; all must be in `strings`
+        strings: Columns holding strings (or None), stored as interned codes.
+            All other columns are numeric (or None) and stored as doubles.
+        int_columns: Numeric columns converted back to int on output
+        memory_budget: Approximate bytes of rows held before spilling a run
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        key: Sequence[str],
+        strings: Iterable[str],
+        int_columns: Iterable[str] = (),
+        memory_budget: int = DEFAULT_MEMORY_BUDGET,
+    ):
+        strings = set(strings)
+        if not set(key) <= strings:
+            raise ValueError(f"Key columns must be string columns: {sorted(set(key) - strings)}")
+
+        self.columns = tuple(columns)
+        # Record layout: key codes first (so a record's prefix is its key),
+        # then the other string codes, then the numbers
+        others = [c for c in self.columns if c in strings and c not in key]
+        numbers = [c for c in self.columns if c not in strings]
+        self._layout = (*key, *others, *numbers)
+        self._n_codes = len(key) + len(others)
+        self._key_size = 4 * len(key)
+        self._record = struct.Struct(f"<{self._n_codes}I{len(numbers)}d")
+        position = {c: i for i, c in enumerate(self.columns)}
+        self._order = [position[c] for c in self._layout]
+        int_columns = set(int_columns)
+        self._is_int = [c in int_columns for c in self._layout]
+
+        self._codes: dict[str | None, int] = {}
+        self._values: list[str | None] = []
+        self._rows: dict[bytes, bytes] = {}
+        self._max_rows = max(1, memory_budget // (self._record.size + _ENTRY_OVERHEAD))
+
+        self._dir: str | None = None
+        self._runs: list[str] = []
+        self._merged: str | None = None
+        self._count: int | None = None
+        self.rows_added = 0
+        self.spills = 0
+
+    def _code(self, value: str | None) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._values)
+            self._values.append(value)
+        return code
+
+    def add(self, row: Sequence) -> None:
+        if self._count is not None:
+            raise RuntimeError("SpillingDeduper.add() called after finish()")
+        values = [row[i] for i in self._order]
+        for i in range(self._n_codes):
+            values[i] = self._code(values[i])
+        for i in range(self._n_codes, len(values)):
+            if values[i] is None:
+                values[i] = math.nan
+        record = self._record.pack(*values)
+        self._rows[record[: self._key_size]] = record
+        self.rows_added += 1
+        if len(self._rows) >= self._max_rows:
+            self._spill()
+
+    def _spill_dir(self) -> str:
+        """This deduper's directory for runs, created on the first spill."""
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix="dedupe-", dir=SPILL_DIR)
+        return self._dir
+
+    def _spill(self) -> None:
+        path = os.path.join(self._spill_dir(), f"run-{len(self._runs)}")
+        with open(path, "wb") as f:
+            for key in sorted(self._rows):
+                f.write(self._rows[key])
+        self._runs.append(path)
+        self.spills += 1
+        logger.info(f"Spilled {len(self._rows)} rows to dedupe run {len(self._runs)}")
+        self._rows = {}
+
+    def _read(self, path: str) -> Iterator[bytes]:
+        size = self._record.size
+        with open(path, "rb") as f:
+            while block := f.read(size * _READ_RECORDS):
+                for start in range(0, len(block), size):
+                    yield block[start : start + size]
+
+    def _keyed(self, run: int) -> Iterator[tuple[bytes, int, bytes]]:
+        for record in self._read(self._runs[run]):
+            yield record[: self._key_size], run, record
+
+    def finish(self) -> int:
+        """Merge spilled runs and return the number of unique rows."""
+        if self._count is not None:
+            return self._count
+        if not self._runs:
+            self._count = len(self._rows)
+            return self._count
+
+        self._spill()
+        key_size = self._key_size
+        # Equal keys come out in run order, so the last one of a group is the
+        # most recently added row
+        runs = [self._keyed(i) for i in range(len(self._runs))]
+        self._merged = os.path.join(self._spill_dir(), "merged")
+        count = 0
+        with open(self._merged, "wb") as f:
+            pending = None
+            for key, _, record in heapq.merge(*runs):
+                if pending is not None and pending[:key_size] != key:
+                    f.write(pending)
+                    count += 1
+                pending = record
+            if pending is not None:
+                f.write(pending)
+                count += 1
+
+        for path in self._runs:
+            os.remove(path)
+        self._runs = []
+        self._count = count
+        logger.info(f"Merged dedupe runs into {count} rows")
+        return count
+
+    def __len__(self) -> int:
+        return self.finish()
+
+    def _decode(self, record: bytes) -> dict:
+        values = list(self._record.unpack(record))
+        for i in range(self._n_codes):
+            values[i] = self._values[values[i]]
+        for i in range(self._n_codes, len(values)):
+            value = values[i]
+            if math.isnan(value):
+                values[i] = None
+            elif self._is_int[i]:
+                values[i] = int(value)
+        row = dict(zip(self._layout, values, strict=True))
+        return {c: row[c] for c in self.columns}
+
+    def __iter__(self) -> Iterator[dict]:
+        self.finish()
+        records = self._read(self._merged) if self._merged else iter(self._rows.values())
+        for record in records:
+            yield self._decode(record)
+
+    def close(self) -> None:
+        """Remove spill files and release the in-memory rows."""
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+        self._rows = {}
+        self._runs = []
+        self._merged = None
+
+    def __enter__(self) -> "SpillingDeduper":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
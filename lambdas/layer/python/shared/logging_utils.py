@@ -7,6 +7,8 @@ import logging
 import time
 from functools import wraps
 
+from shared.continuation import Continuation, TimeBudget, continue_async
+
 
 def setup_logging(level=logging.INFO):
     """Configure structured JSON logging for Lambda."""
@@ -28,7 +30,10 @@ def lambda_handler_wrapper(func):
     Decorator for Lambda handlers that adds:
     - Structured logging setup
     - Timing
-    - Error handling with proper response format
+    - Error logging: a failed run is logged and re-raised, so Lambda marks
+      the invocation failed and its async retries resume from the checkpoint
+    - Continuation: a handler returning a Continuation (it stopped before the
+      timeout) is re-invoked asynchronously to resume from its token
     """
 
     @wraps(func)
@@ -36,39 +41,37 @@ def lambda_handler_wrapper(func):
         logger = setup_logging()
         start = time.time()
         function_name = context.function_name if context else "local"
+        budget = TimeBudget(context)
 
-        logger.info(f"START {function_name}")
+        if context:
+            logger.info(f"START {function_name} ({budget.remaining():.0f}s available)")
+        else:
+            logger.info(f"START {function_name}")
 
         try:
             result = func(event, context)
+            continued_as = None
+            if isinstance(result, Continuation):
+                continued_as = continue_async(event, context, result)
+                result = result.result
             elapsed = time.time() - start
             logger.info(f"END {function_name} ({elapsed:.1f}s)")
 
+            body = {
+                "success": True,
+                "function": function_name,
+                "elapsed_seconds": round(elapsed, 1),
+                "result": result,
+            }
+            if continued_as is not None:
+                body["continued_as_invocation"] = continued_as
             return {
                 "statusCode": 200,
-                "body": json.dumps(
-                    {
-                        "success": True,
-                        "function": function_name,
-                        "elapsed_seconds": round(elapsed, 1),
-                        "result": result,
-                    }
-                ),
+                "body": json.dumps(body),
             }
         except Exception as e:
             elapsed = time.time() - start
             logger.error(f"FAIL {function_name} ({elapsed:.1f}s): {e}", exc_info=True)
-
-            return {
-                "statusCode": 500,
-                "body": json.dumps(
-                    {
-                        "success": False,
-                        "function": function_name,
-                        "elapsed_seconds": round(elapsed, 1),
-                        "error": str(e),
-                    }
-                ),
-            }
+            raise
 
     return wrapper
@@ -0,0 +1,179 @@
+"""
+Conditional fetches of upstream source files, so unchanged sources are skipped.
+
+The ETag, Last-Modified and a content hash of each source are stored in the
+etl_source_state table (Lambda /tmp does not survive between weekly or monthly
+runs). Requests carry If-None-Match / If-Modified-Since; a 304, or a body whose
+hash matches the stored one (for servers that send no validators), means the
+source has not moved and the handler can return early:
+
+    sources = SourceCache()
+    body = sources.fetch(url)
+    if body is None:
+        return {"unchanged": True}
+    ...parse and upsert...
+    sources.commit()
+
+New validators are only written by commit(), after the data has been loaded,
+so a failed run is retried in full next time.
+"""
+
+import hashlib
+import logging
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from http.client import HTTPResponse
+
+from shared.supabase_client import SupabaseError, query, upsert
+
+logger = logging.getLogger(__name__)
+
+SOURCE_STATE_TABLE = "etl_source_state"
+
+
+class SourceCache:
+    """
+    Stored validators for the sources one handler run reads.
+
+    Args:
+        force: Fetch unconditionally (validators are still recorded)
+    """
+
+    def __init__(self, force: bool = False):
+        self.force = force
+        self._stored: dict[str, dict] = {}
+        self._pending: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, source: str) -> dict:
+        if self.force:
+            return {}
+        with self._lock:
+            if source in self._stored:
+                return self._stored[source]
+        try:
+            rows = query(
+                SOURCE_STATE_TABLE,
+                select="etag,last_modified,content_hash",
+                filters=f"source=eq.{urllib.parse.quote(source, safe='')}",
+            )
+        except SupabaseError as e:
+            # Missing table or permissions: behave as if nothing is cached
+            logger.warning(f"Could not read {SOURCE_STATE_TABLE}, fetching {source}: {e}")
+            rows = []
+        with self._lock:
+            self._stored[source] = rows[0] if rows else {}
+            return self._stored[source]
+
+    def _record(self, source: str, resp: HTTPResponse, content_hash: str | None) -> None:
+        with self._lock:
+            self._pending[source] = {
+                "source": source,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "content_hash": content_hash,
+                "checked_at": datetime.now(UTC).isoformat(),
+            }
+
+    def open(
+        self,
+        url: str,
+        headers: dict | None = None,
+        timeout: float = 60,
+        source: str | None = None,
+    ) -> HTTPResponse | None:
+        """
+        GET `url` with the stored validators; return the open response, or
+        None if the server answered 304 Not Modified.
+
+        For large files read as a stream; only ETag/Last-Modified are compared.
+
+        Args:
+            url: Source URL
+            headers: Extra request headers
+            timeout: Socket timeout in seconds
+            source: Key in the state table (default: the URL); use it when the
+                URL carries credentials or varies per run
+        """
+        source = source or url
+        stored = self._load(source)
+        request_headers = {"User-Agent": "MiniAppETL/1.0", **(headers or {})}
+        if stored.get("etag"):
+            request_headers["If-None-Match"] = stored["etag"]
+        if stored.get("last_modified"):
+            request_headers["If-Modified-Since"] = stored["last_modified"]
+
+        req = urllib.request.Request(url, headers=request_headers)
+        try:
+            resp: HTTPResponse = urllib.request.urlopen(req, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                logger.info(f"Source unchanged (304): {source}")
+                return None
+            raise
+
+        self._record(source, resp, content_hash=None)
+        return resp
+
+    def track(self, resp: HTTPResponse, source: str) -> None:
+        """
+        Record the validators of a response fetched outside open(), e.g. a
+        ranged request finishing a read that open() started in an earlier
+        invocation, so commit() stores them.
+        """
+        self._record(source, resp, content_hash=None)
+
+    def fetch(
+        self,
+        url: str,
+        headers: dict | None = None,
+        timeout: float = 60,
+        source: str | None = None,
+    ) -> bytes | None:
+        """
+        GET `url` conditionally and return its body, or None if unchanged by
+        either a 304 or an identical content hash. Arguments as for open().
+        """
+        source = source or url
+        resp = self.open(url, headers=headers, timeout=timeout, source=source)
+        if resp is None:
+            return None
+        with resp:
+            body = resp.read()
+
+        content_hash = hashlib.sha256(body).hexdigest()
+        self._record(source, resp, content_hash)
+        if not self.force and content_hash == self._load(source).get("content_hash"):
+            logger.info(f"Source unchanged (same content): {source}")
+            return None
+        return body
+
+    def pending(self) -> list[dict]:
+        """
+        Validators recorded this run and not yet committed, e.g. to store in a
+        checkpoint so a retry that skips the download can still commit them.
+        """
+        with self._lock:
+            return list(self._pending.values())
+
+    def restore(self, pending: Iterable[dict]) -> None:
+        """Re-record validators saved from pending() by an earlier run."""
+        with self._lock:
+            for row in pending:
+                self._pending[row["source"]] = dict(row)
+
+    def commit(self) -> None:
+        """Store the validators of every source fetched this run."""
+        with self._lock:
+            rows = list(self._pending.values())
+            self._pending.clear()
+        if not rows:
+            return
+        try:
+            upsert(SOURCE_STATE_TABLE, rows, on_conflict="source")
+        except SupabaseError as e:
+            logger.warning(f"Could not store source validators in {SOURCE_STATE_TABLE}: {e}")
@@ -3,80 +3,611 @@ Supabase PostgREST client for Lambda ETL functions.
 
 Uses the REST API directly (no Python SDK dependency) for upserts with
 ON CONFLICT merge-duplicates resolution.
+
+Requests go through a module-level pool of keep-alive HTTPS connections, so
+batches share one TCP+TLS handshake and warm Lambda invocations reuse the
+sockets opened by the previous run.
 """
 
+import functools
+import gzip
+import hashlib
+import http.client
 import json
 import logging
 import os
-import urllib.error
-import urllib.request
+import threading
+import time
+import urllib.parse
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from shared.checkpoint import UpsertCheckpoint
+from shared.postgrest import (
+    GZIP_LEVEL,
+    GZIP_REJECT_STATUSES,
+    QUERY_PAGE_SIZE,
+    WIRE_FORMATS,
+    PageQuery,
+    Response,
+    SupabaseError,
+    batch_encoder,
+    gzip_fallback,
+    query_headers,
+    query_params,
+    query_rows,
+    request_headers,
+    retry_delay,
+    should_gzip,
+    upsert_count,
+)
 
 logger = logging.getLogger(__name__)
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL", "")
 SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_KEY", "")
 
+REQUEST_TIMEOUT = 60
+POOL_MAX_IDLE_PER_HOST = 8
+
+# Adaptive batching: byte budget per request and latency thresholds for resizing
+ADAPTIVE_MAX_BATCH_BYTES = 1024 * 1024
+ADAPTIVE_MIN_ROWS = 25
+ADAPTIVE_MAX_ROWS = 5000
+ADAPTIVE_FAST_SECONDS = 1.0
+ADAPTIVE_SLOW_SECONDS = 8.0
+
+
+class _ConnectionPool:
+    """
+    Keep-alive connections keyed by (scheme, host, port).
+
+    Idle connections are parked after each fully-read response and handed out
+    again on the next request. A parked socket the server has since closed is
+    detected on use and replaced with a fresh connection transparently.
+    """
+
+    def __init__(self, max_idle_per_host: int = POOL_MAX_IDLE_PER_HOST):
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "reused": 0, "reconnected": 0}
+
+    def _connect(self, key: tuple[str, str, int]) -> http.client.HTTPConnection:
+        with self._lock:
+            self.stats["opened"] += 1
+        scheme, host, port = key
+        conn_cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return conn_cls(host, port, timeout=REQUEST_TIMEOUT)
+
+    def _acquire(self, key: tuple[str, str, int]) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats["reused"] += 1
+                return idle.pop(), True
+        return self._connect(key), False
+
+    def _release(self, key: tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(
+        self, method: str, url: str, body: bytes | None = None, headers: dict | None = None
+    ) -> Response:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+        conn, reused = self._acquire(key)
+        try:
+            try:
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError, http.client.BadStatusLine):
+                # A parked keep-alive socket may have been closed by the server
+                # between invocations; retry once on a fresh connection.
+                conn.close()
+                if not reused:
+                    raise
+                with self._lock:
+                    self.stats["reconnected"] += 1
+                conn = self._connect(key)
+                conn.request(method, path, body=body, headers=headers or {})
+                resp = conn.getresponse()
+
+            data = resp.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+        return Response(resp.status, resp.headers, data)
+
+    def close(self) -> None:
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+_pool = _ConnectionPool()
+
+
+def connection_stats() -> dict:
+    """Return counts of pooled connections opened, reused and reconnected."""
+    return dict(_pool.stats)
+
+
+def _request(
+    method: str,
+    url: str,
+    body: bytes | None = None,
+    headers: dict | None = None,
+    retry_timeouts: bool = True,
+) -> Response:
+    """
+    Send a pooled request, retrying 429/5xx responses and dropped connections.
+
+    Backoff follows shared.postgrest.retry_delay. The last response (or error)
+    is returned/raised once MAX_RETRIES is exhausted.
+    """
+    attempt = 0
+    while True:
+        try:
+            resp = _pool.request(method, url, body=body, headers=headers)
+        except OSError as e:
+            delay = retry_delay(method, attempt, error=e, retry_timeouts=retry_timeouts)
+            if delay is None:
+                raise
+        else:
+            delay = retry_delay(method, attempt, resp)
+            if delay is None:
+                return resp
+        attempt += 1
+        time.sleep(delay)
+
+
+def _post_batch(
+    table: str,
+    url: str,
+    headers: dict,
+    data: bytes,
+    n_rows: int,
+    batch_num: int,
+    compress: bool,
+    retry_timeouts: bool = True,
+    split_too_large: bool = False,
+) -> int:
+    """POST one serialized batch and return the row count reported by PostgREST."""
+    if should_gzip(data, compress):
+        gz_headers = {**headers, "Content-Encoding": "gzip"}
+        resp = _request("POST", url, gzip.compress(data, GZIP_LEVEL), gz_headers, retry_timeouts)
+        if resp.status in GZIP_REJECT_STATUSES:
+            resp = _request("POST", url, data, headers, retry_timeouts)
+            gzip_fallback(resp)
+    else:
+        resp = _request("POST", url, data, headers, retry_timeouts)
+    count: int = upsert_count(table, resp, n_rows, batch_num, split_too_large)
+    return count
+
+
+def _fingerprint(row: dict, columns: list[str]) -> bytes:
+    """8-byte digest of a row's values, normalizing numbers so 5 and 5.0 compare equal."""
+    values = []
+    for col in columns:
+        value = row.get(col)
+        if isinstance(value, int | float) and not isinstance(value, bool):
+            value = float(value)
+        values.append(value)
+    return hashlib.blake2b(json.dumps(values).encode("utf-8"), digest_size=8).digest()
+
+
+def fetch_fingerprints(
+    table: str, key_columns: list[str], value_columns: list[str], filters: str = ""
+) -> dict[tuple, bytes]:
+    """
+    Read existing rows as {conflict key: value digest}.
+
+    Only the key and value columns are selected and each row is reduced to an
+    8-byte digest, so the map stays small even for the full market_data table.
+    """
+    fingerprints: dict[tuple, bytes] = {}
+    rows = iter_query(
+        table,
+        select=",".join(key_columns + value_columns),
+        filters=filters,
+        order=",".join(key_columns),
+        prefetch=True,
+    )
+    for row in rows:
+        key = tuple(str(row.get(c)) for c in key_columns)
+        fingerprints[key] = _fingerprint(row, value_columns)
+
+    logger.info(f"Fetched {len(fingerprints)} existing row fingerprints from {table}")
+    return fingerprints
+
+
+class _BatchSizer:
+    """
+    Picks the row count for the next batch from observed payload size and latency.
+
+    The row count is capped so a batch stays under max_bytes at the running
+    average row width, first estimated from a sample of the opening batch
+    before it is sent. Fast responses grow it by half, slow ones halve it, and
+    a 413 or timeout halves it immediately.
+    """
+
+    def __init__(self, initial_rows: int, max_bytes: int):
+        self.rows = max(ADAPTIVE_MIN_ROWS, min(initial_rows, ADAPTIVE_MAX_ROWS))
+        self.max_bytes = max_bytes
+        self.bytes_per_row: float | None = None
+        self.initial = self.rows
+        self.sent: list[int] = []
+        self._lock = threading.Lock()
+
+    def target(self) -> int:
+        with self._lock:
+            if not self.bytes_per_row:
+                return self.rows
+            by_bytes = int(self.max_bytes / self.bytes_per_row)
+            return max(ADAPTIVE_MIN_ROWS, min(self.rows, by_bytes))
+
+    def estimate(self, n_rows: int, n_bytes: int) -> None:
+        """Seed the row width from rows encoded but not yet sent."""
+        with self._lock:
+            if self.bytes_per_row is None:
+                self.bytes_per_row = n_bytes / n_rows
+
+    def observe(self, n_rows: int, n_bytes: int, seconds: float) -> None:
+        with self._lock:
+            self.sent.append(n_rows)
+            width = n_bytes / n_rows
+            if self.bytes_per_row is None:
+                self.bytes_per_row = width
+            else:
+                self.bytes_per_row = 0.8 * self.bytes_per_row + 0.2 * width
+
+            if seconds < ADAPTIVE_FAST_SECONDS and n_rows >= self.rows:
+                self.rows = min(ADAPTIVE_MAX_ROWS, int(self.rows * 1.5))
+            elif seconds > ADAPTIVE_SLOW_SECONDS:
+                self.rows = max(ADAPTIVE_MIN_ROWS, self.rows // 2)
+
+    def shrink(self) -> None:
+        with self._lock:
+            self.rows = max(ADAPTIVE_MIN_ROWS, self.rows // 2)
 
-def _get_headers():
-    return {
-        "apikey": SUPABASE_SERVICE_KEY,
-        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-        "Content-Type": "application/json",
-        "Prefer": "resolution=merge-duplicates,return=representation,count=exact",
-    }
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "initial": self.initial,
+                "min": min(self.sent, default=0),
+                "max": max(self.sent, default=0),
+                "final": self.rows,
+                "batches": len(self.sent),
+            }
 
 
-def upsert(table: str, rows: list[dict], on_conflict: str, batch_size: int = 500) -> dict:
+class UpsertStream:
+    """
+    Streaming upsert sink that sends full batches in the background.
+
+    Rows are buffered until batch_size is reached, then handed to a worker
+    thread while the caller keeps producing. write() blocks once
+    max_concurrency batches are in flight, so memory stays at a few batches
+    regardless of how many rows pass through. The first failed batch stops the
+    stream: queued batches are dropped and the error is re-raised from the
+    next write() or from close().
+
+    With adaptive=True, batch_size is only the starting point: each batch is
+    sized to stay under max_batch_bytes and resized from measured latency, a
+    batch rejected with 413 or timed out is split in half and resent, and
+    result["batch_sizes"] summarises the sizes chosen.
+
+    With a checkpoint, rows are tracked by their position in the stream: each
+    committed batch is recorded as it completes, and rows already committed by
+    an earlier (failed) run are skipped and counted in result["resumed"].
+
+    wire_format="csv" sends batches as text/csv instead of a JSON array of
+    objects, which is smaller and cheaper to build for wide numeric tables.
+
+    With delta=True, existing rows are fingerprinted on the first write (keyed
+    by the on_conflict columns, optionally narrowed by delta_filters) and only
+    new or changed rows are sent. result gains "new", "changed" and "unchanged".
+
+        with UpsertStream("zhvi_values", on_conflict="town_id,date,home_type") as sink:
+            for row in rows:
+                sink.write(row)
+        sink.result  # {"inserted": ..., "total": ...}
+    """
+
+    def __init__(
+        self,
+        table: str,
+        on_conflict: str,
+        batch_size: int = 500,
+        max_concurrency: int = 1,
+        compress: bool = True,
+        adaptive: bool = False,
+        max_batch_bytes: int = ADAPTIVE_MAX_BATCH_BYTES,
+        checkpoint: UpsertCheckpoint | None = None,
+        delta: bool = False,
+        delta_filters: str = "",
+        wire_format: str = "json",
+    ):
+        self._encode = batch_encoder(wire_format)
+        self.table = table
+        self.batch_size = batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.compress = compress
+        self.result: dict = {"inserted": 0, "total": 0}
+        self._sizer = _BatchSizer(batch_size, max_batch_bytes) if adaptive else None
+        self._target = self._sizer.target() if self._sizer else batch_size
+        self._checkpoint = checkpoint
+        if checkpoint is not None:
+            self.result["resumed"] = 0
+        self._key_columns = on_conflict.split(",")
+        self._delta = delta
+        self._delta_filters = delta_filters
+        self._existing: dict[tuple, bytes] | None = None
+        self._value_columns: list[str] = []
+        if delta:
+            self.result.update(new=0, changed=0, unchanged=0)
+
+        self._url = f"{SUPABASE_URL}/rest/v1/{table}?on_conflict={on_conflict}"
+        self._headers = {
+            **request_headers(SUPABASE_SERVICE_KEY),
+            "Content-Type": WIRE_FORMATS[wire_format],
+        }
+        self._batch: list[dict] = []
+        self._batch_ranges: list[list[int]] = []
+        self._position = 0
+        self._batches_sent = 0
+        self._executor: ThreadPoolExecutor | None = None
+        self._slots = threading.Semaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._error: BaseException | None = None
+
+    def __enter__(self) -> "UpsertStream":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._shutdown(cancel=True)
+
+    def write(self, row: dict) -> None:
+        """Buffer one row, sending the batch once it is full."""
+        position = self._position
+        self._position += 1
+        if self._checkpoint is not None:
+            if self._checkpoint.is_committed(position):
+                self.result["resumed"] += 1
+                return
+            if self._batch_ranges and self._batch_ranges[-1][1] == position:
+                self._batch_ranges[-1][1] += 1
+            else:
+                self._batch_ranges.append([position, position + 1])
+
+        if self._delta and not self._is_new_or_changed(row):
+            return
+
+        self._batch.append(row)
+        sizer = self._sizer
+        if sizer and sizer.bytes_per_row is None and len(self._batch) == ADAPTIVE_MIN_ROWS:
+            # Cut the first batch by bytes too, instead of sending batch_size rows blind
+            sizer.estimate(len(self._batch), len(self._encode(self._batch)))
+            self._target = sizer.target()
+        if len(self._batch) >= self._target:
+            self.flush()
+
+    def write_many(self, rows: Iterable[dict]) -> None:
+        for row in rows:
+            self.write(row)
+
+    def flush(self) -> None:
+        """Send whatever is buffered, waiting for a free slot if needed."""
+        self._raise_if_failed()
+        if not self._batch:
+            if self._batch_ranges and self._checkpoint is not None:
+                # Every row since the last send was unchanged: nothing to post,
+                # but those positions are settled and must not be re-diffed
+                ranges, self._batch_ranges = self._batch_ranges, []
+                self._checkpoint.mark_committed((start, end) for start, end in ranges)
+            return
+
+        batch, self._batch = self._batch, []
+        ranges, self._batch_ranges = self._batch_ranges, []
+        self._batches_sent += 1
+
+        self._slots.acquire()
+        self._raise_if_failed()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix=f"upsert-{self.table}"
+            )
+        future = self._executor.submit(self._send, batch, self._batches_sent)
+        future.add_done_callback(functools.partial(self._on_done, n_rows=len(batch), ranges=ranges))
+        if self._sizer:
+            self._target = self._sizer.target()
+
+    def close(self) -> dict:
+        """Flush the last partial batch, wait for all in-flight batches and return counts."""
+        try:
+            self.flush()
+        finally:
+            self._shutdown(cancel=self._error is not None)
+        self._raise_if_failed()
+
+        if self._sizer:
+            self.result["batch_sizes"] = self._sizer.summary()
+        if self.result.get("resumed"):
+            logger.info(f"Skipped {self.result['resumed']} rows committed by a previous run")
+        if self._delta:
+            logger.info(
+                f"Delta for {self.table}: {self.result['new']} new, "
+                f"{self.result['changed']} changed, {self.result['unchanged']} unchanged"
+            )
+        if self.result["inserted"]:
+            logger.info(
+                f"Upserted {self.result['inserted']} rows into {self.table} "
+                f"in {self._batches_sent} batches; connections: {connection_stats()}"
+            )
+        else:
+            logger.info(f"No rows to upsert into {self.table}")
+        return self.result
+
+    def _is_new_or_changed(self, row: dict) -> bool:
+        if self._existing is None:
+            self._value_columns = [c for c in row if c not in self._key_columns]
+            self._existing = fetch_fingerprints(
+                self.table, self._key_columns, self._value_columns, self._delta_filters
+            )
+
+        key = tuple(str(row.get(c)) for c in self._key_columns)
+        existing = self._existing.get(key)
+        if existing is None:
+            self.result["new"] += 1
+            return True
+        if existing == _fingerprint(row, self._value_columns):
+            self.result["unchanged"] += 1
+            return False
+        self.result["changed"] += 1
+        return True
+
+    def _send(self, batch: list[dict], batch_num: int) -> int:
+        data = self._encode(batch)
+        start = time.monotonic()
+        try:
+            count = _post_batch(
+                self.table,
+                self._url,
+                self._headers,
+                data,
+                len(batch),
+                batch_num,
+                self.compress,
+                # Adaptive mode splits timed-out batches instead of resending them whole
+                retry_timeouts=self._sizer is None,
+                split_too_large=self._sizer is not None and len(batch) > 1,
+            )
+        except (SupabaseError, TimeoutError) as e:
+            too_large = isinstance(e, TimeoutError) or e.status == 413
+            if self._sizer is None or not too_large or len(batch) == 1:
+                raise
+            self._sizer.shrink()
+            logger.warning(f"Batch {batch_num} into {self.table} failed ({e}), splitting")
+            mid = len(batch) // 2
+            return self._send(batch[:mid], batch_num) + self._send(batch[mid:], batch_num)
+
+        if self._sizer:
+            self._sizer.observe(len(batch), len(data), time.monotonic() - start)
+        return count
+
+    def _on_done(self, future: Future, n_rows: int, ranges: list[list[int]]) -> None:
+        if not future.cancelled():
+            error = future.exception()
+            with self._lock:
+                if error is None:
+                    self.result["inserted"] += n_rows
+                    self.result["total"] += future.result()
+                elif self._error is None:
+                    self._error = error
+            if error is None and self._checkpoint is not None:
+                self._checkpoint.mark_committed((start, end) for start, end in ranges)
+        self._slots.release()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            self._shutdown(cancel=True)
+            raise self._error
+
+    def _shutdown(self, cancel: bool) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=cancel)
+            self._executor = None
+
+
+def upsert(
+    table: str,
+    rows: Iterable[dict],
+    on_conflict: str,
+    batch_size: int = 500,
+    max_concurrency: int = 1,
+    compress: bool = True,
+    adaptive: bool = False,
+    checkpoint: UpsertCheckpoint | None = None,
+    delta: bool = False,
+    delta_filters: str = "",
+    wire_format: str = "json",
+) -> dict:
     """
     Upsert rows into a Supabase table via PostgREST.
 
     Args:
         table: Table name (e.g., "mortgage_rates")
-        rows: List of row dicts to upsert
+        rows: Row dicts to upsert (list or any iterable; consumed lazily)
         on_conflict: Comma-separated conflict columns (e.g., "town_id,date,home_type")
         batch_size: Max rows per request (PostgREST default limit)
+        max_concurrency: Max batches in flight at once. Batches are sent through a
+            bounded thread pool and the first failed batch stops the upload.
+        compress: Gzip request bodies of at least GZIP_MIN_BYTES. Falls back to plain
+            JSON for the rest of the container's lifetime if the server rejects gzip.
+        adaptive: Size batches by payload bytes and observed latency, starting from
+            batch_size (see UpsertStream).
+        checkpoint: Record committed batches and skip rows a previous run already
+            committed (see shared.checkpoint).
+        delta: Only send rows that are new or whose values differ from what is
+            stored (see UpsertStream).
+        delta_filters: PostgREST filters narrowing the existing rows compared in
+            delta mode (e.g., "home_type=eq.all_homes")
+        wire_format: "json" (default) or "csv" request bodies. CSV writes None
+            as an unquoted NULL.
 
     Returns:
-        dict with "inserted" and "total" counts
+        dict with "inserted" and "total" counts, plus "batch_sizes" when adaptive,
+        "resumed" with a checkpoint and "new"/"changed"/"unchanged" in delta mode
     """
-    if not rows:
-        logger.info(f"No rows to upsert into {table}")
-        return {"inserted": 0, "total": 0}
-
-    url = f"{SUPABASE_URL}/rest/v1/{table}?on_conflict={on_conflict}"
-    headers = _get_headers()
-    total_upserted = 0
-
-    for i in range(0, len(rows), batch_size):
-        batch = rows[i : i + batch_size]
-        data = json.dumps(batch).encode("utf-8")
-
-        req = urllib.request.Request(url, data=data, headers=headers, method="POST")
-
-        try:
-            with urllib.request.urlopen(req) as resp:
-                # Parse content-range header for count: "*/123" or "0-99/123"
-                content_range = resp.getheader("content-range", "")
-                if "/" in content_range:
-                    total_upserted += int(content_range.split("/")[-1])
-                else:
-                    total_upserted += len(batch)
+    with UpsertStream(
+        table,
+        on_conflict,
+        batch_size,
+        max_concurrency,
+        compress,
+        adaptive=adaptive,
+        checkpoint=checkpoint,
+        delta=delta,
+        delta_filters=delta_filters,
+        wire_format=wire_format,
+    ) as sink:
+        sink.write_many(rows)
+    return sink.result
 
-                logger.info(
-                    f"Upserted batch {i // batch_size + 1} into {table}: " f"{len(batch)} rows"
-                )
-        except urllib.error.HTTPError as e:
-            body = e.read().decode("utf-8")
-            logger.error(f"Supabase upsert error ({e.code}): {body}")
-            raise RuntimeError(f"Supabase upsert failed for {table}: {e.code} {body}") from e
 
-    return {"inserted": len(rows), "total": total_upserted}
+def _get_json(table: str, params: str, extra_headers: dict | None = None) -> list[dict]:
+    url = f"{SUPABASE_URL}/rest/v1/{table}?{params}"
+    resp = _request("GET", url, headers=query_headers(SUPABASE_SERVICE_KEY, extra_headers))
+    rows: list[dict] = query_rows(table, resp)
+    return rows
 
 
 def query(table: str, select: str = "*", filters: str = "") -> list[dict]:
     """
     Query a Supabase table via PostgREST.
 
+    Returns at most the server's max-rows; use iter_query() for larger tables.
+
     Args:
         table: Table name
         select: Column selection (PostgREST select syntax)
@@ -85,22 +616,60 @@ def query(table: str, select: str = "*", filters: str = "") -> list[dict]:
     Returns:
         List of row dicts
     """
-    url = f"{SUPABASE_URL}/rest/v1/{table}?select={select}"
-    if filters:
-        url += f"&{filters}"
+    return _get_json(table, query_params(select, filters))
+
+
+def iter_query(
+    table: str,
+    select: str = "*",
+    filters: str = "",
+    page_size: int = QUERY_PAGE_SIZE,
+    order: str = "",
+    prefetch: bool = False,
+) -> Iterator[dict]:
+    """
+    Stream rows from a Supabase table page by page.
+
+    With `order`, pages use keyset pagination: each request asks for rows after
+    the last row of the previous page, so deep pages cost the same as the first.
+    The order columns must identify a row uniquely (e.g., the on_conflict
+    columns) and be non-null. Without `order`, pages are requested with a Range
+    header over the server's natural order.
 
-    headers = {
-        "apikey": SUPABASE_SERVICE_KEY,
-        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
-    }
+    Args:
+        table: Table name
+        select: Column selection; must include the order columns
+        filters: Query string filters applied to every page
+        page_size: Rows per request (at most the server's max-rows)
+        order: Comma-separated columns, optionally suffixed ".desc"
+            (e.g., "town_id,period_begin,property_type")
+        prefetch: Fetch the next page on a background thread while the
+            caller processes the current one
+
+    Yields:
+        Row dicts
+    """
+    pages = PageQuery(select, filters, order, page_size)
 
-    req = urllib.request.Request(url, headers=headers, method="GET")
+    def fetch(last: dict | None, offset: int) -> list[dict]:
+        return _get_json(table, *pages.page(last, offset))
 
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
     try:
-        with urllib.request.urlopen(req) as resp:
-            result: list[dict] = json.loads(resp.read().decode("utf-8"))
-            return result
-    except urllib.error.HTTPError as e:
-        body = e.read().decode("utf-8")
-        logger.error(f"Supabase query error ({e.code}): {body}")
-        raise RuntimeError(f"Supabase query failed for {table}: {e.code} {body}") from e
+        page = fetch(None, 0)
+        offset = 0
+        while page:
+            offset += len(page)
+            more = len(page) >= page_size
+            next_page: Future | None = None
+            if more and executor is not None:
+                next_page = executor.submit(fetch, page[-1], offset)
+
+            yield from page
+
+            if not more:
+                break
+            page = next_page.result() if next_page is not None else fetch(page[-1], offset)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
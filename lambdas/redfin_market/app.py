@@ -1,24 +1,74 @@
 """
 Redfin Market Data Lambda
 
-Streams the Redfin city-level market data TSV.gz (~934MB compressed), filters for
-NJ cities matching our 104 towns, and upserts into the market_data table.
+Streams the Redfin city-level market data TSV.gz (~934MB compressed), routes rows
+for the cities of every configured region (shared.config.REDFIN_REGIONS, keyed by
+state code and city; today NJ's 104 towns) in one pass, and upserts them into
+the market_data table. Pass {"regions": [...]} to load only some regions.
 
 Schedule: Monthly, 5th at 08:00 UTC
 Source: https://redfin-public-data.s3.us-west-2.amazonaws.com/redfin_market_tracker/city_market_tracker.tsv000.gz
 
-Streams line-by-line to avoid loading entire file into memory.
+Streams line-by-line to avoid loading entire file into memory. Runs are
+incremental: only periods from a look-back window before each town's latest
+stored period_begin are considered, and of those only rows that are new or
+changed are upserted (delta mode). Pass {"full_refresh": true} to rewrite the
+whole history, and "lookback_days" to widen the window.
+
+The file is requested conditionally (ETag/Last-Modified); if it has not changed
+since the last successful run the handler returns {"unchanged": true}. Pass
+{"force_fetch": true} (implied by full_refresh) to reload regardless.
+
+Lines are parsed on forked worker processes when the Lambda has more than one
+vCPU, and deduplicated in compact records that spill to /tmp past a memory
+budget. The first pass over a given file (by ETag) also builds a gzip access-point
+index in /tmp; a warm container that has to read the same file again
+decompresses it in parallel segments via HTTP Range requests instead of one
+serial stream.
+
+A streamed pass watches the Lambda time budget. When it runs low, parsing stops
+at a line boundary, the rows so far are upserted, and the function re-invokes
+itself asynchronously with a continuation token (the nearest gzip access point,
+the uncompressed offset to resume at, and the parse state), so a slow download
+spans several invocations instead of timing out and losing the work.
 """
 
+import base64
 import csv
-import gzip
-import io
+import itertools
 import logging
+import multiprocessing
+import os
+import re
+import traceback
 import urllib.request
+import zlib
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, timedelta
+from http.client import HTTPResponse
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import BinaryIO, NamedTuple, cast
 
-from shared.config import REDFIN_NAME_TO_ID
+from shared.checkpoint import UpsertCheckpoint
+from shared.config import REDFIN_REGIONS
+from shared.continuation import CONTINUATION_KEY, Continuation, TimeBudget, invocation_number
+from shared.dedupe import SpillingDeduper
+from shared.field_filter import candidate_records, field_pattern, inner_column
+from shared.gzip_index import (
+    INDEX_AVAILABLE,
+    AccessPoint,
+    GzipIndex,
+    GzipIndexBuilder,
+    start_offset,
+)
 from shared.logging_utils import lambda_handler_wrapper
-from shared.supabase_client import upsert
+from shared.source_cache import SourceCache
+from shared.stream_pipeline import GzipLinePipeline
+from shared.supabase_client import iter_query, query, upsert
 
 logger = logging.getLogger(__name__)
 
@@ -45,6 +95,40 @@ COLUMN_MAP = {
 
 INT_COLUMNS = {"homes_sold", "new_listings", "inventory", "median_dom"}
 
+# Every Redfin column the handler reads; a missing one fails the run up front
+KEY_COLUMNS = ("STATE_CODE", "CITY", "PERIOD_BEGIN", "PERIOD_END", "PROPERTY_TYPE")
+REQUIRED_COLUMNS = KEY_COLUMNS + tuple(COLUMN_MAP)
+
+# Field order of the compact row tuples produced while parsing
+ROW_COLUMNS = ("town_id", "period_begin", "period_end", "property_type", *COLUMN_MAP.values())
+ROW_KEY = ("town_id", "period_begin", "property_type")
+
+# Deduped rows held in memory before sorted runs spill to /tmp
+DEDUPE_MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+# Batches sent to Supabase in parallel
+UPSERT_CONCURRENCY = 4
+
+# Incremental runs keep periods starting up to this many days before a town's
+# latest stored period_begin, so Redfin's revisions of recent months land too
+WATERMARK_LOOKBACK_DAYS = 60
+
+# Gzip index: name in /tmp, uncompressed bytes between access points, and
+# how many segments are decompressed concurrently when an index exists
+INDEX_NAME = "redfin_tracker"
+INDEX_SPAN = 64 * 1024 * 1024
+INDEX_WORKERS = os.cpu_count() or 2
+
+# Worker processes for parsing a streamed file (Lambda has 2 vCPUs at 3008MB;
+# 1 parses on the calling thread) and decompressed bytes per block sent to one
+PARSE_PROCESSES = os.cpu_count() or 1
+PARSE_BLOCK_SIZE = 8 * 1024 * 1024
+
+# Once less than this is left of the 900s timeout, a streamed pass stops so its
+# rows can be deduped and upserted before the function continues itself
+CONTINUATION_RESERVE_SECONDS = 180
+
 
 def safe_float(val: str) -> float | None:
     if not val or val == "" or val == "NA":
@@ -64,78 +148,676 @@ def safe_int(val: str) -> int | None:
         return None
 
 
-@lambda_handler_wrapper
-def handler(event, context):
-    logger.info("Streaming Redfin city market tracker TSV.gz")
+class RegionRoutes(NamedTuple):
+    """Where rows of each city go, built once per run from the region configs."""
+
+    regions: tuple[str, ...]
+    # (STATE_CODE, city lowered) -> ((region, town_id), ...)
+    by_city: dict[tuple[str, str], tuple[tuple[str, str], ...]]
+    states: frozenset[str]
+    # Matches a configured STATE_CODE field (see shared.field_filter). Any line
+    # without one cannot be routed, so it is dropped before decoding.
+    state_field: re.Pattern[bytes]
+
+
+def build_routes(regions: dict[str, dict[tuple[str, str], str]]) -> RegionRoutes:
+    by_city: dict[tuple[str, str], tuple[tuple[str, str], ...]] = {}
+    for region, cities in regions.items():
+        for (state, city), town_id in cities.items():
+            by_city[(state, city)] = (*by_city.get((state, city), ()), (region, town_id))
+
+    states = frozenset(state for state, _ in by_city)
+    return RegionRoutes(
+        regions=tuple(regions),
+        by_city=by_city,
+        states=states,
+        state_field=field_pattern(states, "\t"),
+    )
+
+
+class TrackerColumns(NamedTuple):
+    """Positions of the needed Redfin columns, resolved once from the header."""
+
+    state_code: int
+    city: int
+    period_begin: int
+    period_end: int
+    property_type: int
+    # (db column, position, converter) for each COLUMN_MAP metric
+    metrics: tuple[tuple[str, int, Callable[[str], float | int | None]], ...]
+    # Rows shorter than this are malformed and skipped
+    min_width: int
+
+
+def resolve_columns(header: list[str]) -> TrackerColumns:
+    """Map the needed columns to positions, failing fast if upstream renamed any."""
+    missing = [col for col in REQUIRED_COLUMNS if col not in header]
+    if missing:
+        raise ValueError(f"Redfin header is missing expected columns: {missing}")
+
+    position = {col: header.index(col) for col in REQUIRED_COLUMNS}
+    # RegionRoutes.state_field expects a tab on both sides of the field
+    inner_column(header, "STATE_CODE", "Redfin")
+
+    metrics = tuple(
+        (db_col, position[redfin_col], safe_int if db_col in INT_COLUMNS else safe_float)
+        for redfin_col, db_col in COLUMN_MAP.items()
+    )
+    return TrackerColumns(
+        state_code=position["STATE_CODE"],
+        city=position["CITY"],
+        period_begin=position["PERIOD_BEGIN"],
+        period_end=position["PERIOD_END"],
+        property_type=position["PROPERTY_TYPE"],
+        metrics=metrics,
+        min_width=max(position.values()) + 1,
+    )
+
 
-    req = urllib.request.Request(REDFIN_URL, headers={"User-Agent": "MiniAppETL/1.0"})
-    resp = urllib.request.urlopen(req, timeout=600)
+def candidate_fields(lines: Iterable[bytes], routes: RegionRoutes) -> Iterator[list[str]]:
+    """Field lists for the lines that may be rows of a configured state."""
+    records: Iterator[list[str]] = candidate_records(lines, routes.state_field, "\t")
+    return records
 
-    # Stream-decompress to avoid holding entire file in memory
-    logger.info("Streaming download + gzip decompression...")
-    gz_stream = gzip.GzipFile(fileobj=resp)
-    text_stream = io.TextIOWrapper(gz_stream, encoding="utf-8")
-    reader = csv.DictReader(text_stream, delimiter="\t")
 
-    deduped = {}
-    matched_towns = set()
-    unmatched_nj = set()
-    total_nj_lines = 0
+def parse_header(line: bytes) -> list[str]:
+    return next(csv.reader([line.decode("utf-8")], delimiter="\t"))
 
-    for record in reader:
-        state_code = record.get("STATE_CODE", "")
-        if state_code != "NJ":
+
+def iter_candidate_fields(
+    byte_stream: Iterable[bytes], routes: RegionRoutes
+) -> tuple[list[str], Iterator[list[str]]]:
+    """Return the tracker header and field lists for possibly routed lines."""
+    lines = iter(byte_stream)
+    header = parse_header(next(lines))
+    return header, candidate_fields(lines, routes)
+
+
+class ParseTally:
+    """Counts behind the parse stats; picklable so worker processes can return theirs."""
+
+    def __init__(self):
+        # Lines whose STATE_CODE belongs to a configured region
+        self.state_lines = 0
+        self.matched_towns: dict[str, set[str]] = {}
+        self.unmatched: set[tuple[str, str]] = set()
+
+    def merge(self, other: "ParseTally") -> None:
+        self.state_lines += other.state_lines
+        for region, towns in other.matched_towns.items():
+            self.matched_towns.setdefault(region, set()).update(towns)
+        self.unmatched |= other.unmatched
+
+    def as_dict(self) -> dict:
+        return {
+            "state_lines": self.state_lines,
+            "matched_towns": {
+                region: sorted(towns) for region, towns in self.matched_towns.items()
+            },
+            "unmatched": sorted(self.unmatched),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ParseTally":
+        tally = cls()
+        tally.state_lines = data["state_lines"]
+        tally.matched_towns = {
+            region: set(towns) for region, towns in data["matched_towns"].items()
+        }
+        tally.unmatched = {(state, city) for state, city in data["unmatched"]}
+        return tally
+
+
+def parse_rows(
+    reader: Iterable[list[str]], cols: TrackerColumns, routes: RegionRoutes, tally: ParseTally
+) -> Iterator[tuple]:
+    """Yield a ROW_COLUMNS tuple for each region town a line is routed to."""
+    for fields in reader:
+        if len(fields) < cols.min_width:
+            continue
+        state = fields[cols.state_code]
+        if state not in routes.states:
             continue
 
-        total_nj_lines += 1
-        city = record.get("CITY", "").strip()
-        town_id = REDFIN_NAME_TO_ID.get(city.lower())
+        tally.state_lines += 1
+        city = fields[cols.city].strip()
+        targets = routes.by_city.get((state, city.lower()))
 
-        if not town_id:
-            unmatched_nj.add(city)
+        if not targets:
+            tally.unmatched.add((state, city))
             continue
 
-        matched_towns.add(town_id)
-        period_begin = record.get("PERIOD_BEGIN", "")
-        period_end = record.get("PERIOD_END", "")
-        property_type = record.get("PROPERTY_TYPE", "")
+        for region, town_id in targets:
+            tally.matched_towns.setdefault(region, set()).add(town_id)
+        period_begin = fields[cols.period_begin]
+        property_type = fields[cols.property_type]
 
         if not period_begin or not property_type:
             continue
 
-        row = {
-            "town_id": town_id,
-            "period_begin": period_begin,
-            "period_end": period_end,
-            "property_type": property_type,
-        }
+        # Numeric fields are converted once and shared by every target
+        period_end = fields[cols.period_end]
+        metrics = [convert(fields[position]) for _, position, convert in cols.metrics]
+        for _, town_id in targets:
+            yield (town_id, period_begin, period_end, property_type, *metrics)
 
-        # Numeric fields
-        for redfin_col, db_col in COLUMN_MAP.items():
-            val = record.get(redfin_col, "")
-            if db_col in INT_COLUMNS:
-                row[db_col] = safe_int(val)
-            else:
-                row[db_col] = safe_float(val)
 
-        key = (town_id, period_begin, property_type)
-        deduped[key] = row
+def _parse_worker(conn) -> None:
+    """Worker process: receive columns and routes, then parse blocks until an empty one."""
+    try:
+        cols, routes = conn.recv()
+        while block := conn.recv_bytes():
+            tally = ParseTally()
+            reader = candidate_fields(block.split(b"\n"), routes)
+            rows = list(parse_rows(reader, cols, routes, tally))
+            conn.send((rows, tally))
+    except EOFError:
+        pass  # parent went away
+    except Exception:
+        conn.send(RuntimeError(f"Redfin parse worker failed:\n{traceback.format_exc()}"))
+    finally:
+        conn.close()
 
-    rows = list(deduped.values())
 
-    logger.info(
-        f"NJ lines: {total_nj_lines}, Matched: {len(rows)} rows "
-        f"(deduped from {len(deduped)} keys) across {len(matched_towns)} towns"
+class ParseWorkers:
+    """
+    Forked processes that parse newline-aligned blocks of tracker lines.
+
+    Each worker has its own Pipe and at most one block in flight. Lambda has
+    no /dev/shm, which multiprocessing.Queue and Pool need for their locks,
+    so those are avoided. Enter the context before any other threads start:
+    the workers are forked then.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._conns: list[Connection] = []
+        self._workers: list[BaseProcess] = []
+
+    def __enter__(self) -> "ParseWorkers":
+        ctx = multiprocessing.get_context("fork")
+        for i in range(self.processes):
+            parent_conn, child_conn = ctx.Pipe()
+            worker = ctx.Process(
+                target=_parse_worker, args=(child_conn,), name=f"redfin-parse-{i}", daemon=True
+            )
+            worker.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._workers.append(worker)
+        return self
+
+    def _receive(self, worker: int) -> tuple[list[tuple], ParseTally]:
+        result = self._conns[worker].recv()
+        if isinstance(result, BaseException):
+            raise result
+        return cast(tuple[list[tuple], ParseTally], result)
+
+    def parse(
+        self,
+        blocks: Iterable[bytes],
+        cols: TrackerColumns,
+        routes: RegionRoutes,
+        tally: ParseTally,
+    ) -> Iterator[tuple]:
+        """
+        Yield row tuples from the blocks in file order (blocks go round-robin
+        and results are collected oldest first), so last-wins dedupe sees the
+        same sequence as the serial parse.
+        """
+        for conn in self._conns:
+            conn.send((cols, routes))
+
+        in_flight: deque[int] = deque()
+        for i, block in enumerate(filter(None, blocks)):
+            worker = i % self.processes
+            if len(in_flight) == self.processes:
+                # The oldest block in flight is this worker's
+                rows, worker_tally = self._receive(in_flight.popleft())
+                tally.merge(worker_tally)
+                yield from rows
+            self._conns[worker].send_bytes(block)
+            in_flight.append(worker)
+
+        while in_flight:
+            rows, worker_tally = self._receive(in_flight.popleft())
+            tally.merge(worker_tally)
+            yield from rows
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            for conn in self._conns:
+                conn.send_bytes(b"")
+            for worker in self._workers:
+                worker.join(timeout=5)
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        for conn in self._conns:
+            conn.close()
+
+
+def parse_serial(
+    lines: Iterable[bytes], routes: RegionRoutes, tally: ParseTally
+) -> Iterator[tuple]:
+    header, reader = iter_candidate_fields(lines, routes)
+    yield from parse_rows(reader, resolve_columns(header), routes, tally)
+
+
+class TrackerCursor:
+    """
+    Newline-aligned blocks of tracker lines from a streamed pass, with the
+    header line split off into `header`, tracking the uncompressed offset of
+    the next unread line.
+
+    If the time budget runs low between blocks, iteration ends early with
+    `stopped` set; the pass can later resume at `offset`.
+    """
+
+    def __init__(
+        self,
+        pipeline: GzipLinePipeline,
+        budget: TimeBudget | None = None,
+        offset: int = 0,
+        header: bytes | None = None,
+    ):
+        self.pipeline = pipeline
+        self.budget = budget
+        self.offset = offset
+        self.header = header
+        self.stopped = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        blocks = self.pipeline.blocks(PARSE_BLOCK_SIZE)
+        try:
+            for block in blocks:
+                # Consecutive blocks are separated by exactly one newline
+                self.offset += len(block) + 1
+                if self.header is None:
+                    self.header, _, block = block.partition(b"\n")
+                yield block
+                if self.budget is not None and self.budget.exhausted():
+                    logger.info(f"Time budget low, stopping stream at {self.offset / 1e6:.0f}MB")
+                    self.stopped = True
+                    return
+        finally:
+            blocks.close()
+
+
+def parse_blocks(
+    cursor: TrackerCursor, routes: RegionRoutes, tally: ParseTally, processes: int
+) -> Iterator[tuple]:
+    """Yield row tuples from a cursor's blocks, on worker processes if more than one."""
+    # Fork on the first next(), before the pipeline starts its threads
+    with ParseWorkers(processes) if processes > 1 else nullcontext() as workers:
+        blocks = iter(cursor)
+        first = next(blocks, b"")
+        if cursor.header is None:
+            raise RuntimeError("Redfin tracker file is empty")
+        cols = resolve_columns(parse_header(cursor.header))
+        blocks = itertools.chain([first], blocks)
+        if workers is not None:
+            yield from workers.parse(blocks, cols, routes, tally)
+            return
+        for block in blocks:
+            reader = candidate_fields(block.split(b"\n"), routes)
+            yield from parse_rows(reader, cols, routes, tally)
+
+
+def open_tracker(headers: dict | None = None) -> HTTPResponse:
+    req = urllib.request.Request(
+        REDFIN_URL, headers={"User-Agent": "MiniAppETL/1.0", **(headers or {})}
     )
-    if unmatched_nj:
-        logger.info(f"Unmatched NJ cities in Redfin: {sorted(unmatched_nj)}")
+    resp: HTTPResponse = urllib.request.urlopen(req, timeout=600)
+    return resp
+
+
+def open_range(offset: int, etag: str) -> HTTPResponse:
+    """Open the tracker from a compressed byte offset."""
+    # If-Match: fail rather than splice together two versions of the file
+    resp = open_tracker({"Range": f"bytes={offset}-", "If-Match": etag})
+    if resp.status != 206:
+        resp.close()
+        raise RuntimeError(f"Redfin range request returned HTTP {resp.status}")
+    return resp
 
-    result = upsert("market_data", rows, on_conflict="town_id,period_begin,property_type")
 
+def continuation_token(
+    etag: str, indexer: GzipIndexBuilder, cursor: TrackerCursor, tally: ParseTally
+) -> dict:
+    """Where a stopped pass resumes: the last access point before the next unread line."""
+    if cursor.header is None:
+        raise RuntimeError("Cannot resume a Redfin pass that stopped before its header line")
+    point = [p for p in indexer.points if p.out_offset <= cursor.offset][-1]
     return {
-        "nj_lines_total": total_nj_lines,
-        "towns_matched": len(matched_towns),
-        "rows_upserted": len(rows),
-        "unmatched_nj_cities": sorted(unmatched_nj),
+        "etag": etag,
+        "offset": cursor.offset,
+        "header": cursor.header.decode("utf-8"),
+        "point": {
+            "in_offset": point.in_offset,
+            "bits": point.bits,
+            "out_offset": point.out_offset,
+            "window": base64.b64encode(zlib.compress(point.window)).decode("ascii"),
+        },
+        "tally": tally.as_dict(),
+    }
+
+
+def resume_point(token: dict) -> AccessPoint:
+    point = token["point"]
+    return AccessPoint(
+        in_offset=point["in_offset"],
+        bits=point["bits"],
+        out_offset=point["out_offset"],
+        window=zlib.decompress(base64.b64decode(point["window"])),
+    )
+
+
+def open_resumed(token: dict) -> HTTPResponse:
+    """Open the tracker at the access point of a continuation token."""
+    return open_range(start_offset(resume_point(token)), token["etag"])
+
+
+def iter_indexed_lines(index: GzipIndex, etag: str, routes: RegionRoutes) -> Iterator[bytes]:
+    """
+    Yield the tracker header and possibly routed lines, in file order, by
+    decompressing index segments concurrently from ranged downloads.
+
+    zlib runs outside the GIL, so segments inflate in parallel; lines are
+    prefiltered in the worker so only candidates are held per segment.
+    """
+
+    def open_at(offset: int) -> BinaryIO:
+        return open_range(offset, etag)
+
+    def read_segment(segment: tuple[int, int]) -> list[bytes]:
+        first, last = segment
+        lines = index.iter_lines(first, last, open_at)
+        candidates = [next(lines)] if first == 0 else []
+        candidates.extend(filter(routes.state_field.search, lines))
+        return candidates
+
+    segments = index.segments(INDEX_WORKERS)
+    logger.info(f"Decompressing {len(segments)} segments in parallel from gzip index")
+    with ThreadPoolExecutor(max_workers=len(segments)) as pool:
+        for candidates in pool.map(read_segment, segments):
+            yield from candidates
+
+
+def parse_tracker(
+    resp: HTTPResponse,
+    routes: RegionRoutes,
+    budget: TimeBudget | None = None,
+    resume: dict | None = None,
+) -> tuple[SpillingDeduper, dict, dict | None]:
+    """
+    Stream the Redfin tracker from an open response and return the rows of
+    every routed town, deduped by (town_id, period_begin, property_type),
+    parse stats, and a continuation token if the pass stopped early.
+
+    A streamed pass stops between blocks once `budget` is exhausted (only when
+    the file is being indexed, as resuming needs its access points). With
+    `resume`, resp comes from open_resumed() and the pass picks up where that
+    token's left off, carrying its tallies forward.
+
+    The caller iterates the returned deduper for row dicts and closes it.
+    """
+    etag = resume["etag"] if resume else resp.headers.get("ETag")
+    index = GzipIndex.load(INDEX_NAME, etag) if not resume else None
+
+    pipeline: GzipLinePipeline | None = None
+    indexer: GzipIndexBuilder | None = None
+    cursor: TrackerCursor | None = None
+    processes = 1
+    tally = ParseTally.from_dict(resume["tally"]) if resume else ParseTally()
+    # GzipIndex.load() only finds an index for a response with an ETag
+    if index is not None and etag:
+        resp.close()
+        rows = parse_serial(iter_indexed_lines(index, etag, routes), routes, tally)
+    else:
+        # Download, decompress and parse on separate threads, streaming so the
+        # file is never held in memory; index it on the way for later passes
+        if resume:
+            start = resume_point(resume)
+            logger.info(f"Resuming the stream at {resume['offset'] / 1e6:.0f}MB")
+            indexer = GzipIndexBuilder(INDEX_SPAN, start=start)
+            pipeline = GzipLinePipeline(
+                resp, indexer=indexer, skip=resume["offset"] - start.out_offset
+            )
+            header = resume["header"].encode("utf-8")
+            cursor = TrackerCursor(pipeline, budget, resume["offset"], header)
+        else:
+            logger.info("Streaming download + gzip decompression...")
+            indexer = GzipIndexBuilder(INDEX_SPAN) if INDEX_AVAILABLE and etag else None
+            pipeline = GzipLinePipeline(resp, indexer=indexer)
+            cursor = TrackerCursor(pipeline, budget if indexer is not None else None)
+        processes = PARSE_PROCESSES
+        if processes > 1:
+            logger.info(f"Parsing on {processes} worker processes")
+        rows = parse_blocks(cursor, routes, tally, processes)
+
+    deduped = SpillingDeduper(
+        ROW_COLUMNS,
+        key=ROW_KEY,
+        strings=("town_id", "period_begin", "period_end", "property_type"),
+        int_columns=INT_COLUMNS,
+        memory_budget=DEDUPE_MEMORY_BUDGET,
+    )
+    for row in rows:
+        deduped.add(row)
+    deduped.finish()
+
+    token = None
+    # Only an indexed stream (which needs an ETag) is given the budget to stop early
+    if cursor is not None and cursor.stopped and indexer is not None and etag:
+        token = continuation_token(etag, indexer, cursor, tally)
+    if pipeline is not None:
+        pipeline.log_stats()
+        # A resumed pass only has access points from where it started
+        if pipeline.index is not None and not resume:
+            pipeline.index.save(INDEX_NAME, etag)
+    all_towns = set().union(*tally.matched_towns.values())
+    logger.info(
+        f"Lines in region states: {tally.state_lines}, Matched: {len(deduped)} deduped rows "
+        f"across {len(all_towns)} towns"
+    )
+    unmatched = [f"{city}, {state}" for state, city in sorted(tally.unmatched)]
+    if unmatched:
+        logger.info(f"Unmatched cities in Redfin: {unmatched}")
+
+    stats = {
+        "state_lines_total": tally.state_lines,
+        "towns_matched": len(all_towns),
+        "towns_matched_by_region": {
+            region: len(tally.matched_towns.get(region, ())) for region in routes.regions
+        },
+        "unmatched_cities": unmatched,
+        "decompression": "streamed" if pipeline is not None else "indexed",
+        "parse_processes": processes,
+        "dedupe_spills": deduped.spills,
+    }
+    if pipeline is not None:
+        stats["pipeline"] = pipeline.stats()
+    if resume:
+        stats["resumed_at_offset"] = resume["offset"]
+    if token:
+        stats["stopped_at_offset"] = token["offset"]
+    return deduped, stats, token
+
+
+def fetch_watermarks(lookback_days: int) -> dict[str, str]:
+    """
+    Latest stored period_begin per town in market_data.
+
+    Reads the newest period overall, then only rows within the look-back
+    window of it, rather than scanning every period since 2012. Towns with
+    nothing that recent are left out, so they get their full history.
+
+    The window is read in (town_id, period_begin) order so pages use keyset
+    pagination. That pair repeats across property types, so the keyset
+    skips the repeats of a page's last pair, which carry the same period.
+    """
+    newest = query("market_data", select="period_begin", filters="order=period_begin.desc&limit=1")
+    if not newest:
+        return {}
+
+    window_start = date.fromisoformat(newest[0]["period_begin"]) - timedelta(days=lookback_days)
+    watermarks: dict[str, str] = {}
+    rows = iter_query(
+        "market_data",
+        select="town_id,period_begin",
+        filters=f"period_begin=gte.{window_start.isoformat()}",
+        order="town_id,period_begin",
+    )
+    for row in rows:
+        # Rows arrive in period order within each town, so the last one wins
+        watermarks[row["town_id"]] = row["period_begin"]
+    return watermarks
+
+
+def select_incremental(
+    rows: Iterable[dict], lookback_days: int, watermarks: dict[str, str], stats: dict
+) -> Iterator[dict]:
+    """
+    Yield rows at or after each town's watermark (from fetch_watermarks) minus
+    the look-back, without holding them: a first run keeps the whole history.
+    Counts and the earliest period kept are written to `stats` once the rows
+    have all been consumed.
+    """
+    cutoffs = {
+        town_id: (date.fromisoformat(period_begin) - timedelta(days=lookback_days)).isoformat()
+        for town_id, period_begin in watermarks.items()
+    }
+
+    kept = 0
+    skipped = 0
+    since = None
+    for row in rows:
+        period_begin = row["period_begin"]
+        if period_begin >= cutoffs.get(row["town_id"], ""):
+            kept += 1
+            if since is None or period_begin < since:
+                since = period_begin
+            yield row
+        else:
+            skipped += 1
+
+    logger.info(
+        f"Incremental: {kept} rows within {lookback_days} days of the watermark "
+        f"({len(watermarks)} towns with data), {skipped} older rows skipped"
+    )
+    stats.update(
+        lookback_days=lookback_days,
+        towns_with_watermark=len(watermarks),
+        rows_skipped=skipped,
+        # Earliest period being written; bounds the delta fingerprint fetch
+        since=since,
+    )
+
+
+@lambda_handler_wrapper
+def handler(event, context):
+    event = event if isinstance(event, dict) else {}
+    full_refresh = bool(event.get("full_refresh", False))
+    lookback_days = int(event.get("lookback_days", WATERMARK_LOOKBACK_DAYS))
+    sources = SourceCache(force=full_refresh or bool(event.get("force_fetch", False)))
+    # Set when this invocation continues a pass an earlier one stopped early
+    resume = event.get(CONTINUATION_KEY)
+    budget = TimeBudget(context, reserve_seconds=CONTINUATION_RESERVE_SECONDS)
+
+    region_names = event.get("regions") or list(REDFIN_REGIONS)
+    unknown = sorted(set(region_names) - set(REDFIN_REGIONS))
+    if unknown:
+        raise ValueError(f"Unknown Redfin regions: {unknown}")
+    routes = build_routes({name: REDFIN_REGIONS[name] for name in region_names})
+
+    # A failed run leaves its parsed rows and committed batches in /tmp; a retry
+    # on the same warm container resumes from there instead of re-downloading.
+    checkpoint = UpsertCheckpoint("market_data")
+    # Only rows spooled by the same part of a pass with the same options are
+    # this run's: not a failed incremental run's rows for a full refresh, say
+    run = {
+        "pass_start": resume["offset"] if resume else 0,
+        "full_refresh": full_refresh,
+        "regions": sorted(routes.regions),
+        "lookback_days": lookback_days,
+    }
+    if checkpoint.has_rows() and checkpoint.meta.get("run") != run:
+        logger.info("Discarding checkpointed Redfin rows from a different run or pass part")
+        checkpoint.clear()
+
+    # Keyed by region set too, so adding a region reloads an unchanged file
+    source = f"{REDFIN_URL}#regions={','.join(sorted(routes.regions))}"
+    if checkpoint.has_rows():
+        logger.info("Resuming from checkpointed Redfin rows, skipping download")
+        meta = checkpoint.meta
+        stats = {k: v for k, v in meta.items() if k not in ("rows", "run", "next", "sources")}
+        token = meta.get("next")
+        row_count = meta["rows"]
+        # The failed run's validators, so the source is still marked as loaded
+        sources.restore(meta.get("sources", []))
+        rows = checkpoint.load_rows()
+    else:
+        if resume:
+            resp = open_resumed(resume)
+            sources.track(resp, source)
+        else:
+            resp = sources.open(REDFIN_URL, timeout=600, source=source)
+            if resp is None:
+                return {"unchanged": True}
+        logger.info("Streaming Redfin city market tracker TSV.gz")
+        deduped, stats, token = parse_tracker(resp, routes, budget, resume)
+        with deduped:
+            if full_refresh:
+                logger.info("Full refresh: upserting the whole history")
+                selected = iter(deduped)
+            else:
+                # Every invocation of a continued pass uses the first one's
+                # watermarks, which predate that pass's own upserts
+                watermarks = resume["watermarks"] if resume else fetch_watermarks(lookback_days)
+                stats["incremental"] = {}
+                selected = select_incremental(
+                    deduped, lookback_days, watermarks, stats["incremental"]
+                )
+                if token:
+                    token["watermarks"] = watermarks
+            stats["full_refresh"] = full_refresh
+            # Rows go straight to the spool; the incremental stats are only
+            # complete once they have all streamed through
+            row_count = checkpoint.save_rows(
+                selected,
+                meta=lambda: {**stats, "run": run, "next": token, "sources": sources.pending()},
+            )
+        # Upload from the spool rather than holding every row in memory
+        rows = checkpoint.load_rows()
+
+    # A full refresh rewrites every row; otherwise skip rows already up to date,
+    # comparing only against stored rows in the incremental window
+    since = stats.get("incremental", {}).get("since")
+    result = upsert(
+        "market_data",
+        rows,
+        on_conflict="town_id,period_begin,property_type",
+        max_concurrency=UPSERT_CONCURRENCY,
+        adaptive=True,
+        wire_format="csv",
+        checkpoint=checkpoint,
+        delta=not stats.get("full_refresh", False),
+        delta_filters=f"period_begin=gte.{since}" if since else "",
+    )
+    checkpoint.clear()
+
+    rows_total = (resume or {}).get("rows_upserted", 0) + row_count
+    summary = {
+        **stats,
+        "invocation": invocation_number(event),
+        "rows_upserted": row_count,
+        "rows_upserted_total": rows_total,
         "upsert_result": result,
     }
+    if token:
+        # The source is only marked as loaded once the last part is in
+        return Continuation(summary, {**token, "rows_upserted": rows_total})
+    sources.commit()
+    return summary
@@ -0,0 +1,324 @@
+"""
+asyncio variant of the Supabase PostgREST client.
+
+Speaks HTTP/1.1 over asyncio streams (standard library only) with a pool of
+keep-alive connections per event loop and a semaphore bounding requests in
+flight, so handlers can overlap source fetches with loading in one loop:
+
+    async def load():
+        rows = await asyncio.to_thread(fetch_county, year, fips)
+        return await upsert("town_demographics", rows, on_conflict="town_id,year")
+
+Request building, retry decisions and response handling come from
+shared.postgrest, so batching, gzip, CSV and retries match
+shared.supabase_client; this module only adds the asyncio transport.
+Adaptive sizing, checkpoints and delta mode are only in the threaded client.
+"""
+
+import asyncio
+import contextlib
+import gzip
+import http.client
+import io
+import logging
+import ssl
+import urllib.parse
+from collections.abc import AsyncIterator, Iterable
+
+from shared import supabase_client as sync
+from shared.postgrest import (
+    GZIP_LEVEL,
+    GZIP_REJECT_STATUSES,
+    QUERY_PAGE_SIZE,
+    WIRE_FORMATS,
+    PageQuery,
+    Response,
+    batch_encoder,
+    gzip_fallback,
+    query_headers,
+    query_params,
+    query_rows,
+    request_headers,
+    retry_delay,
+    should_gzip,
+    upsert_count,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = 4
+
+_Key = tuple[str, str, int]
+_Conn = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class _AsyncConnectionPool:
+    """
+    Keep-alive stream pairs keyed by (scheme, host, port).
+
+    Streams belong to the event loop that opened them, so the pool starts
+    over when used from a new loop (each asyncio.run() in a warm container).
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.stats = {"opened": 0, "reused": 0, "reconnected": 0}
+        self._idle: dict[_Key, list[_Conn]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._ssl: ssl.SSLContext | None = None
+
+    def _bind_loop(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._slots is None:
+            for conns in self._idle.values():
+                for _, writer in conns:
+                    # Previous loop already closed; the socket goes with the transport
+                    with contextlib.suppress(RuntimeError):
+                        writer.transport.abort()
+            self._idle.clear()
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    async def _connect(self, key: _Key) -> _Conn:
+        self.stats["opened"] += 1
+        scheme, host, port = key
+        if scheme == "https" and self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        return await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=self._ssl if scheme == "https" else None),
+            sync.REQUEST_TIMEOUT,
+        )
+
+    async def request(
+        self, method: str, url: str, body: bytes | None = None, headers: dict | None = None
+    ) -> Response:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+        head = [f"{method} {path} HTTP/1.1", f"Host: {parts.netloc}"]
+        head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        head.append(f"Content-Length: {len(body or b'')}")
+        raw = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + (body or b"")
+
+        async with self._bind_loop():
+            idle = self._idle.get(key)
+            reused = bool(idle)
+            if idle:
+                self.stats["reused"] += 1
+                conn = idle.pop()
+            else:
+                conn = await self._connect(key)
+
+            try:
+                try:
+                    resp, keep_alive = await self._exchange(conn, raw)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # A parked keep-alive socket may have been closed by the server
+                    conn[1].transport.abort()
+                    if not reused:
+                        raise
+                    self.stats["reconnected"] += 1
+                    conn = await self._connect(key)
+                    resp, keep_alive = await self._exchange(conn, raw)
+            except BaseException:
+                conn[1].transport.abort()
+                raise
+
+            if keep_alive:
+                self._idle.setdefault(key, []).append(conn)
+            else:
+                conn[1].close()
+            return resp
+
+    async def _exchange(self, conn: _Conn, raw: bytes) -> tuple[Response, bool]:
+        reader, writer = conn
+        writer.write(raw)
+        await writer.drain()
+        return await asyncio.wait_for(self._read_response(reader), sync.REQUEST_TIMEOUT)
+
+    async def _read_response(self, reader: asyncio.StreamReader) -> tuple[Response, bool]:
+        head = await reader.readuntil(b"\r\n\r\n")
+        status_line, _, header_block = head.partition(b"\r\n")
+        version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+        headers = http.client.parse_headers(io.BytesIO(header_block))
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readuntil(b"\r\n")
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            return Response(int(status), headers, body), False
+
+        keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+        return Response(int(status), headers, body), keep_alive
+
+
+_pool = _AsyncConnectionPool()
+
+
+def connection_stats() -> dict:
+    """Return counts of async connections opened, reused and reconnected."""
+    return dict(_pool.stats)
+
+
+async def _request(
+    method: str, url: str, body: bytes | None = None, headers: dict | None = None
+) -> Response:
+    """Send a pooled request, retrying 429/5xx responses and dropped connections."""
+    attempt = 0
+    while True:
+        try:
+            resp = await _pool.request(method, url, body=body, headers=headers)
+        except (OSError, asyncio.IncompleteReadError) as e:
+            delay = retry_delay(method, attempt, error=e)
+            if delay is None:
+                raise
+        else:
+            delay = retry_delay(method, attempt, resp)
+            if delay is None:
+                return resp
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def _post_batch(
+    table: str, url: str, headers: dict, data: bytes, n_rows: int, batch_num: int, compress: bool
+) -> int:
+    if should_gzip(data, compress):
+        gz_headers = {**headers, "Content-Encoding": "gzip"}
+        body = await asyncio.to_thread(gzip.compress, data, GZIP_LEVEL)
+        resp = await _request("POST", url, body, gz_headers)
+        if resp.status in GZIP_REJECT_STATUSES:
+            resp = await _request("POST", url, data, headers)
+            gzip_fallback(resp)
+    else:
+        resp = await _request("POST", url, data, headers)
+    count: int = upsert_count(table, resp, n_rows, batch_num)
+    return count
+
+
+async def upsert(
+    table: str,
+    rows: Iterable[dict],
+    on_conflict: str,
+    batch_size: int = 500,
+    max_concurrency: int = MAX_CONCURRENCY,
+    compress: bool = True,
+    wire_format: str = "json",
+) -> dict:
+    """
+    Upsert rows into a Supabase table via PostgREST.
+
+    Batches are sent as tasks, at most max_concurrency per call in flight
+    (and never more than the pool's limit overall). The first failed batch
+    cancels the others and is re-raised.
+
+    Returns:
+        dict with "inserted" and "total" counts
+    """
+    encode = batch_encoder(wire_format)
+    url = f"{sync.SUPABASE_URL}/rest/v1/{table}?on_conflict={on_conflict}"
+    headers = {
+        **request_headers(sync.SUPABASE_SERVICE_KEY),
+        "Content-Type": WIRE_FORMATS[wire_format],
+    }
+    slots = asyncio.Semaphore(max(1, max_concurrency))
+    result = {"inserted": 0, "total": 0}
+
+    async def send(batch: list[dict], batch_num: int) -> None:
+        try:
+            count = await _post_batch(
+                table, url, headers, encode(batch), len(batch), batch_num, compress
+            )
+        finally:
+            slots.release()
+        result["inserted"] += len(batch)
+        result["total"] += count
+
+    batch: list[dict] = []
+    batch_num = 0
+    async with asyncio.TaskGroup() as tasks:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                await slots.acquire()
+                batch_num += 1
+                tasks.create_task(send(batch, batch_num))
+                batch = []
+        if batch:
+            await slots.acquire()
+            batch_num += 1
+            tasks.create_task(send(batch, batch_num))
+
+    if result["inserted"]:
+        logger.info(
+            f"Upserted {result['inserted']} rows into {table} in {batch_num} batches; "
+            f"connections: {connection_stats()}"
+        )
+    else:
+        logger.info(f"No rows to upsert into {table}")
+    return result
+
+
+async def query(table: str, select: str = "*", filters: str = "") -> list[dict]:
+    """Query a Supabase table via PostgREST (at most the server's max-rows)."""
+    return await _get_json(table, query_params(select, filters))
+
+
+async def _get_json(table: str, params: str, extra_headers: dict | None = None) -> list[dict]:
+    url = f"{sync.SUPABASE_URL}/rest/v1/{table}?{params}"
+    headers = query_headers(sync.SUPABASE_SERVICE_KEY, extra_headers)
+    rows: list[dict] = query_rows(table, await _request("GET", url, headers=headers))
+    return rows
+
+
+async def iter_query(
+    table: str,
+    select: str = "*",
+    filters: str = "",
+    page_size: int = QUERY_PAGE_SIZE,
+    order: str = "",
+    prefetch: bool = False,
+) -> AsyncIterator[dict]:
+    """Async counterpart of shared.supabase_client.iter_query (same arguments)."""
+    pages = PageQuery(select, filters, order, page_size)
+
+    async def fetch(last: dict | None, offset: int) -> list[dict]:
+        return await _get_json(table, *pages.page(last, offset))
+
+    next_page: asyncio.Task | None = None
+    try:
+        page = await fetch(None, 0)
+        offset = 0
+        while page:
+            offset += len(page)
+            more = len(page) >= page_size
+            if more and prefetch:
+                next_page = asyncio.create_task(fetch(page[-1], offset))
+
+            for row in page:
+                yield row
+
+            if not more:
+                break
+            if next_page is not None:
+                page, next_page = await next_page, None
+            else:
+                page = await fetch(page[-1], offset)
+    finally:
+        if next_page is not None:
+            next_page.cancel()
@@ -0,0 +1,143 @@
+"""
+Durable upsert checkpoints for resuming failed ETL runs.
+
+A checkpoint lives in /tmp, which survives between invocations of a warm
+Lambda container (including async retries of a failed run). It records:
+  - which row positions of the upload have been committed, so a rerun skips
+    batches that already succeeded
+  - optionally the parsed rows themselves plus handler stats, so a rerun can
+    skip the download and parse entirely
+
+Checkpoints older than CHECKPOINT_TTL_SECONDS are treated as stale and dropped,
+so next month's scheduled run never resumes from last month's data.
+"""
+
+import bisect
+import contextlib
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = os.environ.get("ETL_CHECKPOINT_DIR", "/tmp/etl-checkpoints")
+CHECKPOINT_TTL_SECONDS = 24 * 3600
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class UpsertCheckpoint:
+    """
+    Tracks committed row ranges (by position in the upload) for one named job.
+
+    Row positions are only meaningful while the rows are produced in the same
+    order, so pair this with save_rows()/load_rows() or with a deterministic
+    source.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int = CHECKPOINT_TTL_SECONDS):
+        self.name = name
+        self.path = os.path.join(CHECKPOINT_DIR, f"{name}.json")
+        self.rows_path = os.path.join(CHECKPOINT_DIR, f"{name}.rows.jsonl.gz")
+        self.meta: dict = {}
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._lock = threading.Lock()
+
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        self._load(ttl_seconds)
+
+    def _load(self, ttl_seconds: int) -> None:
+        try:
+            age = time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return
+
+        if age > ttl_seconds:
+            logger.info(f"Discarding stale checkpoint {self.name} ({age / 3600:.1f}h old)")
+            self.clear()
+            return
+
+        with open(self.path) as f:
+            state = json.load(f)
+        self.meta = state.get("meta", {})
+        for start, end in state.get("committed", []):
+            self._starts.append(start)
+            self._ends.append(end)
+        if self._starts:
+            logger.info(f"Loaded checkpoint {self.name}: {self.committed_rows} rows committed")
+
+    def _save(self) -> None:
+        state = {"meta": self.meta, "committed": list(zip(self._starts, self._ends, strict=True))}
+        _atomic_write(self.path, json.dumps(state).encode("utf-8"))
+
+    @property
+    def committed_rows(self) -> int:
+        return sum(end - start for start, end in zip(self._starts, self._ends, strict=True))
+
+    def is_committed(self, position: int) -> bool:
+        i = bisect.bisect_right(self._starts, position) - 1
+        return i >= 0 and position < self._ends[i]
+
+    def mark_committed(self, ranges: Iterable[tuple[int, int]]) -> None:
+        """Record [start, end) row ranges as committed and persist immediately."""
+        with self._lock:
+            merged = sorted([*zip(self._starts, self._ends, strict=True), *ranges])
+            starts: list[int] = []
+            ends: list[int] = []
+            for start, end in merged:
+                if ends and start <= ends[-1]:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self._starts, self._ends = starts, ends
+            self._save()
+
+    def has_rows(self) -> bool:
+        return os.path.exists(self.rows_path) and os.path.exists(self.path)
+
+    def save_rows(self, rows: Iterable[dict], meta: dict | Callable[[], dict] | None = None) -> int:
+        """
+        Spool parsed rows (and handler stats) so a rerun can skip fetching.
+
+        `meta` may be a callable, called once every row has been written, for
+        stats gathered while the rows stream in.
+        """
+        count = 0
+        tmp_path = f"{self.rows_path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=1) as f:
+            for row in rows:
+                f.write(json.dumps(row))
+                f.write("\n")
+                count += 1
+        os.replace(tmp_path, self.rows_path)
+
+        if callable(meta):
+            meta = meta()
+        with self._lock:
+            self.meta = {**(meta or {}), "rows": count}
+            self._save()
+        logger.info(f"Spooled {count} rows to checkpoint {self.name}")
+        return count
+
+    def load_rows(self) -> Iterator[dict]:
+        with gzip.open(self.rows_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def clear(self) -> None:
+        for path in (self.path, self.rows_path):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+        self.meta = {}
+        self._starts, self._ends = [], []
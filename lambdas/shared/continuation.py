@@ -0,0 +1,101 @@
+"""
+Time budget and self-continuation for handlers that can outrun the Lambda timeout.
+
+A handler checks a TimeBudget while it works. Once the remaining time drops
+under the budget's reserve, it stops at a resumable point, commits what it has,
+and returns a Continuation carrying a JSON-serializable token describing where
+to pick up. lambda_handler_wrapper then re-invokes the same function
+asynchronously with the original event plus {"continuation": token}:
+
+    budget = TimeBudget(context, reserve_seconds=120)
+    token = event.get(CONTINUATION_KEY)     # None on the first invocation
+    ...work, checking budget.exhausted()...
+    if stopped_early:
+        return Continuation(result, next_token)
+    return result
+
+Locally (no context) the budget never runs out, so handlers run to completion.
+"""
+
+import json
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+CONTINUATION_KEY = "continuation"
+
+# Upper bound on chained invocations of one run, against a handler that
+# keeps stopping without making progress
+MAX_CONTINUATIONS = 10
+
+
+class TimeBudget:
+    """
+    Remaining invocation time, from the Lambda context.
+
+    Args:
+        context: Lambda context (None when run locally: unlimited time)
+        reserve_seconds: Time to keep for wrapping up after stopping early
+    """
+
+    def __init__(self, context, reserve_seconds: float = 0):
+        self._context = context
+        self.reserve_seconds = reserve_seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the invocation times out."""
+        if self._context is None:
+            return math.inf
+        return float(self._context.get_remaining_time_in_millis()) / 1000
+
+    def exhausted(self) -> bool:
+        """True once only the reserve is left."""
+        return self.remaining() < self.reserve_seconds
+
+
+class Continuation:
+    """
+    Handler return value meaning "stopped early, carry on in a new invocation".
+
+    Args:
+        result: This invocation's result, returned as usual
+        token: JSON-serializable state passed to the next invocation as
+            event["continuation"]
+    """
+
+    def __init__(self, result, token: dict):
+        self.result = result
+        self.token = token
+
+
+def invocation_number(event) -> int:
+    """1 for a fresh run, n for the nth invocation of a continued one."""
+    token = event.get(CONTINUATION_KEY) if isinstance(event, dict) else None
+    return token.get("invocation", 1) if token else 1
+
+
+def continue_async(event, context, continuation: Continuation) -> int:
+    """
+    Re-invoke the running function asynchronously to resume from the token.
+
+    Returns the number of the new invocation. Needs lambda:InvokeFunction on
+    the function itself.
+    """
+    if context is None:
+        raise RuntimeError("Cannot continue a handler run outside Lambda")
+    invocation = invocation_number(event) + 1
+    if invocation > MAX_CONTINUATIONS:
+        raise RuntimeError(f"Giving up after {MAX_CONTINUATIONS} chained invocations")
+
+    import boto3  # provided by the Lambda runtime
+
+    base = event if isinstance(event, dict) else {}
+    payload = {**base, CONTINUATION_KEY: {**continuation.token, "invocation": invocation}}
+    boto3.client("lambda").invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType="Event",
+        Payload=json.dumps(payload).encode("utf-8"),
+    )
+    logger.info(f"Continuing as invocation {invocation} of {context.function_name}")
+    return invocation
@@ -0,0 +1,51 @@
+"""
+Raw-bytes prefilter for the lines of large delimited files.
+
+The Redfin and Zillow national files are mostly other states, so handlers
+test each line's bytes for one of the wanted state fields before decoding
+and splitting it:
+
+    pattern = field_pattern(("NJ", "New Jersey"), ",")
+    state_pos = inner_column(header, "StateName", "Zillow")
+    for fields in candidate_records(lines, pattern, ","):
+        if fields[state_pos] in ("NJ", "New Jersey"):
+            ...
+
+The check is a superset, since a value can also match in another column, so
+callers still test the field exactly.
+"""
+
+import csv
+import re
+from collections.abc import Iterable, Iterator
+
+
+def field_pattern(values: Iterable[str], delimiter: str) -> re.Pattern[bytes]:
+    """Match any of `values` as a whole field, bare or quoted, between two delimiters."""
+    sep = re.escape(delimiter.encode())
+    alternatives = b"|".join(re.escape(value.encode()) for value in sorted(values))
+    return re.compile(sep + rb'"?(?:' + alternatives + rb')"?' + sep)
+
+
+def inner_column(header: list[str], column: str, source: str) -> int:
+    """
+    Position of `column`, which must have a delimiter on both sides for
+    field_pattern to find it.
+    """
+    position = header.index(column)
+    if not 0 < position < len(header) - 1:
+        raise ValueError(f"{source} {column} column is not between other columns")
+    return position
+
+
+def candidate_records(
+    lines: Iterable[bytes], pattern: re.Pattern[bytes], delimiter: str
+) -> Iterator[list[str]]:
+    """
+    Field lists for the lines matching `pattern` on raw bytes.
+
+    Candidates go through csv.reader with the file's delimiter, so quoting is
+    handled the same as parsing every line.
+    """
+    candidates = (line.decode("utf-8") for line in lines if pattern.search(line))
+    return csv.reader(candidates, delimiter=delimiter)
@@ -0,0 +1,421 @@
+"""
+Random-access index into a single-stream gzip file (zlib's zran technique).
+
+A gzip file is one deflate stream, so normally it can only be decompressed
+from the start. While inflating it once, GzipIndexBuilder records an access
+point every `span` bytes of output: the compressed bit position of a deflate
+block boundary plus the 32KiB of output preceding it (the back-reference
+window). A later reader can then prime a raw inflater with that window and
+start decompressing at the access point, so separate byte ranges of the same
+file can be fetched and inflated in parallel.
+
+    builder = GzipIndexBuilder()
+    for data in builder.feed(chunk): ...     # while streaming the file once
+    index = builder.finish()
+    index.save("redfin_tracker", etag)       # keyed by the source's ETag
+
+    index = GzipIndex.load("redfin_tracker", etag)
+    for first, last in index.segments(4):
+        index.iter_lines(first, last, open_at)   # one worker per segment
+
+Python's zlib module does not expose Z_BLOCK, inflatePrime or window access,
+so this binds the system libz through ctypes. INDEX_AVAILABLE is False where
+libz cannot be loaded, and callers fall back to a plain streaming pass.
+Indexes live under CHECKPOINT_DIR in /tmp, so they are reused by warm Lambda
+containers (retries, continuations, reruns against an unchanged file).
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import struct
+import zlib
+from collections.abc import Callable, Generator, Iterator
+from typing import BinaryIO, NamedTuple
+
+from shared.checkpoint import CHECKPOINT_DIR, _atomic_write
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.path.join(CHECKPOINT_DIR, "gzip-index")
+
+# Uncompressed bytes between access points; each point costs a 32KiB window
+DEFAULT_SPAN = 32 * 1024 * 1024
+WINDOW_SIZE = 32768
+CHUNK_SIZE = 1024 * 1024
+
+_MAGIC = b"GZIDX1\n"
+_HEADER = struct.Struct("<QQI")
+_POINT = struct.Struct("<QBQI")
+
+# zlib constants (zlib.h)
+_Z_OK = 0
+_Z_STREAM_END = 1
+_Z_NEED_DICT = 2
+_Z_BUF_ERROR = -5
+_Z_NO_FLUSH = 0
+_Z_BLOCK = 5
+
+
+class _ZStream(ctypes.Structure):
+    _fields_ = [
+        ("next_in", ctypes.c_void_p),
+        ("avail_in", ctypes.c_uint),
+        ("total_in", ctypes.c_ulong),
+        ("next_out", ctypes.c_void_p),
+        ("avail_out", ctypes.c_uint),
+        ("total_out", ctypes.c_ulong),
+        ("msg", ctypes.c_char_p),
+        ("state", ctypes.c_void_p),
+        ("zalloc", ctypes.c_void_p),
+        ("zfree", ctypes.c_void_p),
+        ("opaque", ctypes.c_void_p),
+        ("data_type", ctypes.c_int),
+        ("adler", ctypes.c_ulong),
+        ("reserved", ctypes.c_ulong),
+    ]
+
+
+def _load_libz() -> ctypes.CDLL | None:
+    for name in (ctypes.util.find_library("z"), "libz.so.1", "libz.dylib"):
+        if not name:
+            continue
+        try:
+            lib = ctypes.CDLL(name)
+        except OSError:
+            continue
+        if not hasattr(lib, "inflateGetDictionary"):  # zlib < 1.2.8
+            continue
+        stream_p = ctypes.POINTER(_ZStream)
+        lib.zlibVersion.restype = ctypes.c_char_p
+        lib.inflateInit2_.argtypes = [stream_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        lib.inflate.argtypes = [stream_p, ctypes.c_int]
+        lib.inflateEnd.argtypes = [stream_p]
+        lib.inflateReset.argtypes = [stream_p]
+        lib.inflatePrime.argtypes = [stream_p, ctypes.c_int, ctypes.c_int]
+        lib.inflateSetDictionary.argtypes = [stream_p, ctypes.c_char_p, ctypes.c_uint]
+        lib.inflateGetDictionary.argtypes = [
+            stream_p,
+            ctypes.c_char_p,
+            ctypes.POINTER(ctypes.c_uint),
+        ]
+        return lib
+    return None
+
+
+_libz = _load_libz()
+INDEX_AVAILABLE = _libz is not None
+
+
+class _Inflater:
+    """Thin wrapper over a libz z_stream. ctypes releases the GIL around each call."""
+
+    def __init__(self, wbits: int, out_size: int = CHUNK_SIZE):
+        if _libz is None:
+            raise RuntimeError("libz could not be loaded; gzip indexing is unavailable")
+        self._lib = _libz
+        self._closed = True
+        self.strm = _ZStream()
+        self._ref = ctypes.byref(self.strm)
+        version = self._lib.zlibVersion()
+        self._check(self._lib.inflateInit2_(self._ref, wbits, version, ctypes.sizeof(_ZStream)))
+        self._closed = False
+        self._out = ctypes.create_string_buffer(out_size)
+        self._out_addr = ctypes.addressof(self._out)
+        self._out_size = out_size
+        self._input = b""
+
+    def _check(self, ret: int) -> int:
+        if ret < 0 and ret != _Z_BUF_ERROR or ret == _Z_NEED_DICT:
+            msg = self.strm.msg.decode() if self.strm.msg else f"code {ret}"
+            raise zlib.error(f"Error while decompressing data: {msg}")
+        return ret
+
+    def set_input(self, data: bytes) -> None:
+        self._input = data  # keep the buffer alive while libz points into it
+        self.strm.next_in = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p).value
+        self.strm.avail_in = len(data)
+
+    def inflate(self, flush: int) -> tuple[int, bytes]:
+        self.strm.next_out = self._out_addr
+        self.strm.avail_out = self._out_size
+        ret = self._check(self._lib.inflate(self._ref, flush))
+        produced = self._out_size - self.strm.avail_out
+        return ret, ctypes.string_at(self._out_addr, produced) if produced else b""
+
+    def window(self) -> bytes:
+        buf = ctypes.create_string_buffer(WINDOW_SIZE)
+        length = ctypes.c_uint(0)
+        self._check(self._lib.inflateGetDictionary(self._ref, buf, ctypes.byref(length)))
+        return buf.raw[: length.value]
+
+    def prime(self, bits: int, value: int) -> None:
+        self._check(self._lib.inflatePrime(self._ref, bits, value))
+
+    def set_dictionary(self, window: bytes) -> None:
+        self._check(self._lib.inflateSetDictionary(self._ref, window, len(window)))
+
+    def reset(self) -> None:
+        self._check(self._lib.inflateReset(self._ref))
+
+    def close(self) -> None:
+        # Also reached from __del__ when __init__ failed before inflateInit2_
+        if not getattr(self, "_closed", True):
+            self._lib.inflateEnd(self._ref)
+            self._closed = True
+
+    def __del__(self):
+        self.close()
+
+
+class AccessPoint(NamedTuple):
+    # Compressed byte offset just past the block boundary; when bits > 0 the
+    # boundary falls inside the preceding byte, whose top `bits` bits are the
+    # start of the next block.
+    in_offset: int
+    bits: int
+    out_offset: int
+    window: bytes
+
+
+def _index_path(name: str, etag: str) -> str:
+    digest = hashlib.sha1(etag.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_DIR, f"{name}.{digest}.gzidx")
+
+
+def start_offset(point: AccessPoint) -> int:
+    """Compressed byte offset to read from when resuming at `point`."""
+    return point.in_offset - (1 if point.bits else 0)
+
+
+class GzipIndex:
+    """Access points into one gzip file, in increasing offset order."""
+
+    def __init__(self, points: list[AccessPoint], length: int, span: int):
+        self.points = points
+        self.length = length
+        self.span = span
+
+    def save(self, name: str, etag: str) -> str:
+        """Persist under INDEX_DIR keyed by ETag, dropping indexes of older versions."""
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        path = _index_path(name, etag)
+        for entry in os.listdir(INDEX_DIR):
+            if entry.startswith(f"{name}.") and entry.endswith(".gzidx"):
+                os.remove(os.path.join(INDEX_DIR, entry))
+
+        parts = [_MAGIC, _HEADER.pack(self.length, self.span, len(self.points))]
+        for point in self.points:
+            window = zlib.compress(point.window)
+            parts.append(_POINT.pack(point.in_offset, point.bits, point.out_offset, len(window)))
+            parts.append(window)
+        data = b"".join(parts)
+        _atomic_write(path, data)
+        logger.info(f"Saved gzip index {name}: {len(self.points)} points, {len(data) / 1e6:.1f}MB")
+        return path
+
+    @classmethod
+    def load(cls, name: str, etag: str | None) -> "GzipIndex | None":
+        """Return the saved index for this ETag, or None if there is none."""
+        if not etag or not INDEX_AVAILABLE:
+            return None
+        try:
+            with open(_index_path(name, etag), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if not data.startswith(_MAGIC):
+            logger.warning(f"Ignoring unreadable gzip index for {name}")
+            return None
+
+        pos = len(_MAGIC)
+        length, span, count = _HEADER.unpack_from(data, pos)
+        pos += _HEADER.size
+        points = []
+        for _ in range(count):
+            in_offset, bits, out_offset, size = _POINT.unpack_from(data, pos)
+            pos += _POINT.size
+            window = zlib.decompress(data[pos : pos + size])
+            pos += size
+            points.append(AccessPoint(in_offset, bits, out_offset, window))
+        logger.info(f"Loaded gzip index {name}: {count} points over {length / 1e6:.0f}MB")
+        return cls(points, length, span)
+
+    def segments(self, n: int) -> list[tuple[int, int]]:
+        """Split the points into at most n contiguous [first, last) ranges of similar size."""
+        n = max(1, min(n, len(self.points)))
+        bounds = [round(i * len(self.points) / n) for i in range(n + 1)]
+        return [(bounds[i], bounds[i + 1]) for i in range(n)]
+
+    def iter_from(self, first: int, open_at: Callable[[int], BinaryIO]) -> Generator[bytes]:
+        """
+        Decompress from access point `first` to the end of the stream.
+
+        open_at(offset) must return a file object reading the compressed file
+        from that byte offset (a seeked file, or an HTTP Range response).
+        Closing the generator early closes the file object.
+        """
+        point = self.points[first]
+        fileobj = open_at(start_offset(point))
+        inflater = _Inflater(wbits=-15)
+        try:
+            if point.bits:
+                byte = fileobj.read(1)
+                if not byte:
+                    raise EOFError("Compressed file ended before the access point")
+                inflater.prime(point.bits, byte[0] >> (8 - point.bits))
+            if point.window:
+                inflater.set_dictionary(point.window)
+
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    raise EOFError("Compressed file ended before the end-of-stream marker")
+                inflater.set_input(chunk)
+                while True:
+                    ret, out = inflater.inflate(_Z_NO_FLUSH)
+                    if out:
+                        yield out
+                    if ret == _Z_STREAM_END:
+                        return
+                    if inflater.strm.avail_in == 0 and inflater.strm.avail_out != 0:
+                        break
+        finally:
+            inflater.close()
+            fileobj.close()
+
+    def iter_lines(
+        self, first: int, last: int, open_at: Callable[[int], BinaryIO]
+    ) -> Iterator[bytes]:
+        """
+        Yield the lines (without newline) that start between access points
+        `first` and `last` (exclusive; len(points) means end of file).
+
+        Adjacent segments together yield every line exactly once: a line
+        straddling a boundary belongs to the segment it starts in.
+        """
+        end = self.points[last].out_offset if last < len(self.points) else None
+        pos = self.points[first].out_offset
+        # Unless the access point is at a line start, the first partial line
+        # was emitted by the previous segment
+        skip_partial = first > 0 and not self.points[first].window.endswith(b"\n")
+        remainder = b""
+
+        chunks = self.iter_from(first, open_at)
+        try:
+            for chunk in chunks:
+                lines = (remainder + chunk).split(b"\n")
+                remainder = lines.pop()
+                for line in lines:
+                    if skip_partial:
+                        skip_partial = False
+                    elif end is not None and pos >= end:
+                        return
+                    else:
+                        yield line
+                    pos += len(line) + 1
+            if remainder and not skip_partial and (end is None or pos < end):
+                yield remainder
+        finally:
+            chunks.close()
+
+
+class GzipIndexBuilder:
+    """
+    Inflate a gzip stream fed in chunks, recording access points along the way.
+
+    finish() returns the index, or None if the file has several gzip members
+    (access points are only supported within a single deflate stream).
+
+    With `start`, inflation resumes mid-stream from that access point: feed
+    the file from start_offset(start), not from the beginning. Offsets and new
+    points are still those of the whole file; the gzip trailer is not checked.
+    """
+
+    def __init__(self, span: int = DEFAULT_SPAN, start: AccessPoint | None = None):
+        # 31: expect a gzip header and trailer; -15: raw deflate from a point
+        self._inflater = _Inflater(wbits=31 if start is None else -15)
+        self.span = span
+        self.points: list[AccessPoint] = []
+        self._in_offset = 0
+        self._out_offset = 0
+        self._members = 0
+        self._in_member = False
+        self._start = start
+        self._raw = start is not None
+        if start is not None:
+            self.points.append(start)
+            self._in_offset = start_offset(start)
+            self._out_offset = start.out_offset
+
+    def _prime(self, point: AccessPoint, data: bytes) -> bytes:
+        """Set up a resumed inflater from the start point; return the rest of data."""
+        self._start = None
+        if point.bits:
+            self._inflater.prime(point.bits, data[0] >> (8 - point.bits))
+            self._in_offset += 1
+            data = data[1:]
+        if point.window:
+            self._inflater.set_dictionary(point.window)
+        return data
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """Yield the decompressed output of the next chunk of compressed input."""
+        if self._raw and self._members:
+            return
+        if self._start is not None and data:
+            data = self._prime(self._start, data)
+        inflater = self._inflater
+        strm = inflater.strm
+        inflater.set_input(data)
+        consumed_before = self._in_offset
+        while True:
+            if not self._in_member:
+                if strm.avail_in == 0:
+                    break
+                if self._members:
+                    inflater.reset()
+                self._in_member = True
+
+            ret, out = inflater.inflate(_Z_BLOCK)
+            self._in_offset = consumed_before + len(data) - strm.avail_in
+            if out:
+                self._out_offset += len(out)
+                yield out
+
+            if ret == _Z_STREAM_END:
+                self._members += 1
+                self._in_member = False
+                if self._raw:
+                    break  # what follows is the gzip trailer
+                continue
+
+            # Bit 7: stopped at a block boundary; bit 6: that was the last block
+            at_boundary = strm.data_type & 128 and not strm.data_type & 64
+            if at_boundary and self._members == 0 and self._due():
+                self.points.append(
+                    AccessPoint(
+                        in_offset=self._in_offset,
+                        bits=strm.data_type & 7,
+                        out_offset=self._out_offset,
+                        window=inflater.window(),
+                    )
+                )
+            if strm.avail_in == 0 and strm.avail_out != 0:
+                break
+
+    def _due(self) -> bool:
+        if not self.points:
+            return True
+        return self._out_offset - self.points[-1].out_offset >= self.span
+
+    def finish(self) -> GzipIndex | None:
+        self._inflater.close()
+        if self._in_member:
+            raise EOFError("Compressed file ended before the end-of-stream marker")
+        if self._members != 1:
+            logger.info(f"Gzip file has {self._members} members; not indexing it")
+            return None
+        return GzipIndex(self.points, self._out_offset, self.span)
@@ -0,0 +1,296 @@
+"""
+PostgREST protocol pieces shared by the threaded and asyncio Supabase clients.
+
+Transport-independent: request headers, batch encoders, error and response
+types, retry classification and backoff, upsert and query response handling,
+page requests for iter_query and the process-wide switch that stops
+gzip-encoding request bodies once a gateway rejects them. Both
+shared.supabase_client and shared.async_supabase_client build on these and
+keep only their transport, so the two clients send and interpret requests
+the same way.
+"""
+
+import csv
+import email.utils
+import http.client
+import io
+import json
+import logging
+import random
+import time
+import urllib.parse
+from collections.abc import Callable
+from typing import NamedTuple
+
+# Request bodies at least this large are sent gzip-encoded
+GZIP_MIN_BYTES = 16 * 1024
+GZIP_LEVEL = 6
+# Statuses a gateway returns when it won't accept a Content-Encoding
+GZIP_REJECT_STATUSES = {400, 415}
+
+# Unquoted CSV field PostgREST reads as SQL NULL (an empty field is an empty string)
+CSV_NULL = "NULL"
+WIRE_FORMATS = {"json": "application/json", "csv": "text/csv"}
+
+# Transient failures are retried with jittered exponential backoff
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+RETRY_BASE_SECONDS = 0.5
+RETRY_MAX_SECONDS = 60.0
+
+# Rows per page for paginated reads; must not exceed the server's max-rows
+# (Supabase default 1000) or pages come back short and iteration stops early
+QUERY_PAGE_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+_gzip_disabled = False
+
+
+class SupabaseError(RuntimeError):
+    """PostgREST returned an error status."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class Response(NamedTuple):
+    status: int
+    headers: http.client.HTTPMessage
+    body: bytes
+
+
+def gzip_enabled() -> bool:
+    """False once a gateway has rejected a gzip-encoded body in this process."""
+    return not _gzip_disabled
+
+
+def disable_gzip() -> None:
+    """Send request bodies uncompressed from now on."""
+    global _gzip_disabled
+    _gzip_disabled = True
+
+
+def request_headers(service_key: str) -> dict:
+    """Auth and upsert preference headers for a request with the service key."""
+    return {
+        "apikey": service_key,
+        "Authorization": f"Bearer {service_key}",
+        "Content-Type": "application/json",
+        "Prefer": "resolution=merge-duplicates,return=representation,count=exact",
+    }
+
+
+def query_headers(service_key: str, extra_headers: dict | None = None) -> dict:
+    """Auth headers for a read with the service key, plus any extra headers."""
+    return {
+        "apikey": service_key,
+        "Authorization": f"Bearer {service_key}",
+        **(extra_headers or {}),
+    }
+
+
+def retry_after(resp: Response) -> float:
+    """Seconds requested by a Retry-After header (delta-seconds or HTTP-date), else 0."""
+    value = resp.headers.get("retry-after")
+    if not value:
+        return 0.0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def retry_delay(
+    method: str,
+    attempt: int,
+    resp: Response | None = None,
+    error: BaseException | None = None,
+    retry_timeouts: bool = True,
+) -> float | None:
+    """
+    Seconds to wait before retrying a request, or None to stop retrying.
+
+    Pass the response, or the transport error raised instead of one. 429/5xx
+    responses and dropped connections are retried up to MAX_RETRIES times
+    (timeouts only with retry_timeouts), waiting full-jitter exponential
+    backoff or longer if the server sent Retry-After.
+    """
+    if attempt >= MAX_RETRIES:
+        return None
+    if resp is not None:
+        if resp.status not in RETRY_STATUSES:
+            return None
+        reason = f"HTTP {resp.status}"
+        delay = retry_after(resp)
+    else:
+        if isinstance(error, TimeoutError) and not retry_timeouts:
+            return None
+        reason = str(error) or type(error).__name__
+        delay = 0.0
+
+    backoff = random.uniform(0, RETRY_BASE_SECONDS * 2**attempt)
+    delay = min(RETRY_MAX_SECONDS, max(delay, backoff))
+    logger.warning(
+        f"Supabase {method} failed ({reason}), retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s"
+    )
+    return delay
+
+
+def should_gzip(data: bytes, compress: bool) -> bool:
+    """Whether to send a request body gzip-encoded."""
+    return compress and gzip_enabled() and len(data) >= GZIP_MIN_BYTES
+
+
+def gzip_fallback(resp: Response) -> None:
+    """
+    Record the outcome of resending a gzip-rejected body uncompressed.
+
+    If the plain resend succeeded, the gateway rejects gzip rather than the
+    batch, so later bodies are sent uncompressed.
+    """
+    if resp.status < 400:
+        logger.warning("Supabase rejected gzip request bodies, sending uncompressed")
+        disable_gzip()
+
+
+def upsert_count(
+    table: str, resp: Response, n_rows: int, batch_num: int, split_too_large: bool = False
+) -> int:
+    """
+    Row count PostgREST reported for an upsert batch; raises SupabaseError on failure.
+
+    With split_too_large, the caller resends a 413 as smaller batches, so it
+    is logged as a warning rather than an error.
+    """
+    if resp.status >= 400:
+        body = resp.body.decode("utf-8")
+        if split_too_large and resp.status == 413:
+            logger.warning(f"Supabase rejected batch {batch_num} of {n_rows} rows as too large")
+        else:
+            logger.error(f"Supabase upsert error ({resp.status}): {body}")
+        raise SupabaseError(
+            f"Supabase upsert failed for {table}: {resp.status} {body}", resp.status
+        )
+
+    logger.info(f"Upserted batch {batch_num} into {table}: {n_rows} rows")
+
+    # Parse content-range header for count: "*/123" or "0-99/123"
+    content_range = resp.headers.get("content-range", "")
+    if "/" in content_range:
+        return int(content_range.split("/")[-1])
+    return n_rows
+
+
+def query_rows(table: str, resp: Response) -> list[dict]:
+    """Rows from a query response; raises SupabaseError on failure."""
+    if resp.status >= 400:
+        body = resp.body.decode("utf-8")
+        logger.error(f"Supabase query error ({resp.status}): {body}")
+        raise SupabaseError(f"Supabase query failed for {table}: {resp.status} {body}", resp.status)
+
+    result: list[dict] = json.loads(resp.body.decode("utf-8"))
+    return result
+
+
+def query_params(select: str = "*", filters: str = "") -> str:
+    params = f"select={select}"
+    if filters:
+        params += f"&{filters}"
+    return params
+
+
+def encode_json(batch: list[dict]) -> bytes:
+    return json.dumps(batch).encode("utf-8")
+
+
+def encode_csv(batch: list[dict]) -> bytes:
+    """
+    Encode a batch as CSV: one header line, then plain value rows.
+
+    The header is the union of the batch's keys, so a row missing a column
+    gets NULL there, the same as PostgREST does for JSON arrays.
+    """
+    columns = list(dict.fromkeys(col for row in batch for col in row))
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(columns)
+    writer.writerows(
+        [CSV_NULL if (value := row.get(col)) is None else value for col in columns] for row in batch
+    )
+    return buf.getvalue().encode("utf-8")
+
+
+_ENCODERS = {"json": encode_json, "csv": encode_csv}
+
+
+def batch_encoder(wire_format: str) -> Callable[[list[dict]], bytes]:
+    """The encoder for a wire format (json or csv)."""
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError(f"Unknown wire_format {wire_format!r}, expected json or csv")
+    return _ENCODERS[wire_format]
+
+
+def _filter_value(value) -> str:
+    """Quote a value for use inside a PostgREST or=(...) filter, URL-encoded."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return urllib.parse.quote(f'"{text}"', safe="")
+
+
+def keyset_filter(order_cols: list[tuple[str, bool]], last: dict) -> str:
+    """
+    Filter selecting rows strictly after `last` in the given ordering.
+
+    One column gives "col=gt.value"; several give the row-value comparison
+    expanded into or=(a.gt.x,and(a.eq.x,b.gt.y),...).
+    """
+    if len(order_cols) == 1:
+        col, desc = order_cols[0]
+        op = "lt" if desc else "gt"
+        return f"{col}={op}.{urllib.parse.quote(str(last[col]), safe='')}"
+
+    clauses = []
+    for i, (col, desc) in enumerate(order_cols):
+        terms = [f"{c}.eq.{_filter_value(last[c])}" for c, _ in order_cols[:i]]
+        terms.append(f"{col}.{'lt' if desc else 'gt'}.{_filter_value(last[col])}")
+        clauses.append(f"and({','.join(terms)})" if len(terms) > 1 else terms[0])
+    return f"or=({','.join(clauses)})"
+
+
+class PageQuery:
+    """
+    Query strings (and headers) for the successive pages of an iter_query.
+
+    With an order, pages use keyset pagination: each page asks for rows after
+    the last row of the previous one. Without, pages are requested with a
+    Range header over the server's natural order.
+    """
+
+    def __init__(self, select: str, filters: str, order: str, page_size: int):
+        self.page_size = page_size
+        self._base = query_params(select, filters)
+        self._order = order
+        self._order_cols: list[tuple[str, bool]] = []
+        for part in filter(None, order.split(",")):
+            col, _, direction = part.partition(".")
+            self._order_cols.append((col, direction == "desc"))
+        if self._order_cols and select != "*":
+            missing = {c for c, _ in self._order_cols} - set(select.split(","))
+            if missing:
+                raise ValueError(f"iter_query select must include order columns {sorted(missing)}")
+
+    def page(self, last: dict | None, offset: int) -> tuple[str, dict | None]:
+        """Params and extra headers for the page after `last` (keyset) or at `offset` (Range)."""
+        if not self._order_cols:
+            end = offset + self.page_size - 1
+            return self._base, {"Range-Unit": "items", "Range": f"{offset}-{end}"}
+
+        params = f"{self._base}&order={self._order}&limit={self.page_size}"
+        if last is not None:
+            params += f"&{keyset_filter(self._order_cols, last)}"
+        return params, None
@@ -0,0 +1,263 @@
+"""
+Threaded download -> decompress -> parse pipeline for large gzip sources.
+
+Network reads and zlib inflation each run on their own thread, joined to the
+consumer by bounded queues of large byte chunks. zlib releases the GIL while
+inflating, so on a multi-vCPU Lambda the socket keeps draining and
+decompression proceeds while the calling thread parses lines.
+
+    pipeline = GzipLinePipeline(resp)
+    for line in pipeline:
+        ...
+    pipeline.stats()  # per-stage bytes, throughput, and time blocked
+
+Passing a GzipIndexBuilder as `indexer` inflates through it instead, so the
+same pass records a random-access index (see shared.gzip_index).
+
+Each stage reports time spent waiting on its input and on its output; the
+stage with the least waiting is the bottleneck. The read stage's work is
+time blocked on the socket, so its throughput is the download rate.
+"""
+
+import logging
+import queue
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from typing import BinaryIO
+
+from shared.gzip_index import GzipIndex, GzipIndexBuilder
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+QUEUE_DEPTH = 8
+
+# Queue sentinel marking the end of a stage's output
+_EOF = object()
+
+
+class _StageStats:
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.wait_input = 0.0
+        self.wait_output = 0.0
+        self.started = time.monotonic()
+        self.finished: float | None = None
+
+    def as_dict(self) -> dict:
+        elapsed = (self.finished or time.monotonic()) - self.started
+        working = max(elapsed - self.wait_input - self.wait_output, 1e-9)
+        return {
+            "mb_in": round(self.bytes_in / 1e6, 1),
+            "mb_out": round(self.bytes_out / 1e6, 1),
+            "mb_per_s": round(self.bytes_in / 1e6 / working, 1),
+            "wait_input_s": round(self.wait_input, 1),
+            "wait_output_s": round(self.wait_output, 1),
+            "elapsed_s": round(elapsed, 1),
+        }
+
+
+class GzipLinePipeline:
+    """
+    Iterate the lines (without newline) of a gzip byte stream using a reader
+    thread and a decompressor thread. Errors in either thread are re-raised in
+    the consumer; abandoning iteration early stops both threads.
+
+    With an `indexer`, `index` holds the finished GzipIndex once iteration
+    completes (None if the file could not be indexed). `skip` discards that
+    many decompressed bytes first, e.g. to reach a line start when resuming
+    from an access point.
+    """
+
+    def __init__(
+        self,
+        fileobj: BinaryIO,
+        chunk_size: int = CHUNK_SIZE,
+        queue_depth: int = QUEUE_DEPTH,
+        indexer: GzipIndexBuilder | None = None,
+        skip: int = 0,
+    ):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.indexer = indexer
+        self.index: GzipIndex | None = None
+        self._skip = skip
+        self._compressed: queue.Queue = queue.Queue(maxsize=queue_depth)
+        self._decompressed: queue.Queue = queue.Queue(maxsize=queue_depth)
+        self._stop = threading.Event()
+        self._stats = {name: _StageStats() for name in ("read", "inflate", "parse")}
+        self._threads = [
+            threading.Thread(target=self._read, name="pipeline-read", daemon=True),
+            threading.Thread(target=self._inflate, name="pipeline-inflate", daemon=True),
+        ]
+        self._started = False
+
+    def _put(self, q: queue.Queue, item, stats: _StageStats) -> bool:
+        start = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                stats.wait_output += time.monotonic() - start
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue, stats: _StageStats):
+        start = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.5)
+                stats.wait_input += time.monotonic() - start
+                return item
+            except queue.Empty:
+                continue
+        return _EOF
+
+    def _read(self) -> None:
+        stats = self._stats["read"]
+        try:
+            while not self._stop.is_set():
+                # Time blocked on the socket is this stage's work
+                chunk = self.fileobj.read(self.chunk_size)
+                if not chunk:
+                    break
+                stats.bytes_in += len(chunk)
+                stats.bytes_out += len(chunk)
+                if not self._put(self._compressed, chunk, stats):
+                    return
+            self._put(self._compressed, _EOF, stats)
+        except BaseException as e:
+            self._put(self._compressed, e, stats)
+        finally:
+            stats.finished = time.monotonic()
+
+    def _inflate(self) -> None:
+        if self.indexer is not None:
+            self._inflate_indexed(self.indexer)
+            return
+        stats = self._stats["inflate"]
+        # wbits=31: gzip container; a new decompressor per concatenated member
+        inflater = zlib.decompressobj(wbits=31)
+        in_member = False
+        try:
+            while True:
+                item = self._get(self._compressed, stats)
+                if item is _EOF and in_member:
+                    raise EOFError("Compressed file ended before the end-of-stream marker")
+                if item is _EOF or isinstance(item, BaseException):
+                    self._put(self._decompressed, item, stats)
+                    return
+                stats.bytes_in += len(item)
+                data = item
+                while data:
+                    in_member = True
+                    out = inflater.decompress(data)
+                    if out:
+                        stats.bytes_out += len(out)
+                        if not self._put(self._decompressed, out, stats):
+                            return
+                    if not inflater.eof:
+                        break
+                    data = inflater.unused_data
+                    inflater = zlib.decompressobj(wbits=31)
+                    in_member = False
+        except BaseException as e:
+            self._put(self._decompressed, e, stats)
+        finally:
+            stats.finished = time.monotonic()
+
+    def _inflate_indexed(self, indexer: GzipIndexBuilder) -> None:
+        stats = self._stats["inflate"]
+        try:
+            while True:
+                item = self._get(self._compressed, stats)
+                if item is _EOF:
+                    self.index = indexer.finish()
+                if item is _EOF or isinstance(item, BaseException):
+                    self._put(self._decompressed, item, stats)
+                    return
+                stats.bytes_in += len(item)
+                for out in indexer.feed(item):
+                    stats.bytes_out += len(out)
+                    if not self._put(self._decompressed, out, stats):
+                        return
+        except BaseException as e:
+            self._put(self._decompressed, e, stats)
+        finally:
+            stats.finished = time.monotonic()
+
+    def _iter_chunks(self) -> Iterator[bytes]:
+        if self._started:
+            raise RuntimeError("GzipLinePipeline can only be iterated once")
+        self._started = True
+        for stage in self._stats.values():
+            stage.started = time.monotonic()
+        for thread in self._threads:
+            thread.start()
+
+        stats = self._stats["parse"]
+        try:
+            while True:
+                item = self._get(self._decompressed, stats)
+                if item is _EOF:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                stats.bytes_in += len(item)
+                if self._skip:
+                    if len(item) <= self._skip:
+                        self._skip -= len(item)
+                        continue
+                    item, self._skip = item[self._skip :], 0
+                yield item
+        finally:
+            stats.finished = time.monotonic()
+            self._stop.set()
+
+    def __iter__(self) -> Iterator[bytes]:
+        remainder = b""
+        for chunk in self._iter_chunks():
+            lines = (remainder + chunk).split(b"\n")
+            remainder = lines.pop()
+            yield from lines
+        if remainder:
+            yield remainder
+
+    def blocks(self, min_size: int) -> Iterator[bytes]:
+        """
+        Alternative to iterating lines: yield runs of whole lines of at least
+        min_size bytes (except the last), joined by newlines without a
+        trailing one, e.g. to hand to worker processes.
+        """
+        pending: list[bytes] = []
+        size = 0
+        for chunk in self._iter_chunks():
+            pending.append(chunk)
+            size += len(chunk)
+            if size < min_size:
+                continue
+            data = b"".join(pending)
+            cut = data.rfind(b"\n")
+            if cut < 0:
+                pending = [data]
+                continue
+            yield data[:cut]
+            pending = [data[cut + 1 :]]
+            size = len(pending[0])
+        data = b"".join(pending)
+        if data.endswith(b"\n"):
+            data = data[:-1]
+        if data:
+            yield data
+
+    def stats(self) -> dict:
+        """Per-stage counters: MB in/out, throughput while working, and seconds blocked."""
+        return {name: stage.as_dict() for name, stage in self._stats.items()}
+
+    def log_stats(self) -> None:
+        for name, stage in self.stats().items():
+            logger.info(f"Pipeline {name}: {stage}")
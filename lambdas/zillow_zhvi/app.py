@@ -1,32 +1,119 @@
 """
 Zillow ZHVI Lambda
 
-Downloads the City-level Zillow Home Value Index (ZHVI) CSV, filters for NJ cities
-matching our 104 towns, and upserts monthly values into the zhvi_values table.
+Downloads the City-level Zillow Home Value Index (ZHVI) CSVs listed in
+ZHVI_VARIANTS (all homes, single family, condo, 1-5 bedrooms, top and bottom
+price tiers), filters for NJ cities matching our 104 towns, and upserts monthly
+values into the zhvi_values table under each variant's home_type. Files are
+fetched and parsed FETCH_CONCURRENCY at a time and all loaded through one
+upsert stream. Pass {"variants": [...home_types]} to load only some.
 
 Schedule: Monthly, 18th at 08:00 UTC
-Source: https://files.zillowstatic.com/research/public_csvs/zhvi/City_zhvi_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv
+Source: https://files.zillowstatic.com/research/public_csvs/zhvi/{City,Zip}_zhvi_*.csv
 
-Uses the City-level file (~5MB) instead of ZIP-level (~91MB) for efficiency.
-Not all 104 towns appear in Zillow data - those are simply skipped.
+The City-level files (~5MB each) cover most towns. The boroughs Zillow has no
+city series for (Rockleigh, Teterboro, etc.) get all_homes values from the
+ZIP-level file (~91MB) instead: each NJ ZIP row is routed through the
+zip_weights crosswalk in shared.config and folded into running weighted means
+per town, so that file is read in one pass with memory bounded by the towns,
+not the ZIPs.
+
+Each CSV is streamed line by line: lines without an NJ StateName field are
+dropped on raw bytes, so memory follows the NJ subset rather than the national
+file. Matched rows are parsed into a columnar ZhviMatrix (town x month, NaN
+for blanks) and melted into long-format rows for zhvi_values.
+
+Runs are incremental: Zillow's smoothed series only revises its last few
+months, so only date columns within "revision_months" (default 6) of each
+home_type's latest stored date are parsed; older columns are skipped. Towns
+with nothing stored in that window get their full history. Pass
+{"full_refresh": true} to reload every month.
+
+Files that have not changed since the last run (ETag/Last-Modified) are
+skipped, and {"unchanged": true} is returned if none have; pass
+{"force_fetch": true} (implied by full_refresh) to reload regardless.
 """
 
 import csv
-import io
+import itertools
 import logging
-import urllib.request
+import math
+from array import array
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, BinaryIO, NamedTuple
 
-from shared.config import ZILLOW_NAME_TO_ID
+from shared.config import ZILLOW_NAME_TO_ID, ZILLOW_ZIP_TOWN_IDS, ZIP_TO_TOWNS
+from shared.field_filter import candidate_records, field_pattern, inner_column
 from shared.logging_utils import lambda_handler_wrapper
-from shared.supabase_client import upsert
+from shared.source_cache import SourceCache
+from shared.supabase_client import UpsertStream, iter_query, query
 
 logger = logging.getLogger(__name__)
 
-ZHVI_CITY_URL = (
-    "https://files.zillowstatic.com/research/public_csvs/zhvi/"
-    "City_zhvi_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv"
+ZHVI_BASE_URL = "https://files.zillowstatic.com/research/public_csvs/zhvi/"
+
+
+class ZhviVariant(NamedTuple):
+    """One ZHVI file and the zhvi_values.home_type it is loaded as."""
+
+    home_type: str
+    file: str
+    # "city" rows match towns by name; "zip" rows are aggregated per town
+    level: str = "city"
+
+    @property
+    def url(self) -> str:
+        return ZHVI_BASE_URL + self.file
+
+    @property
+    def name(self) -> str:
+        return self.home_type if self.level == "city" else f"{self.home_type}_{self.level}"
+
+
+# Every series loaded; add a file here to load it. Mid-tier (0.33-0.67)
+# smoothed, seasonally adjusted values unless the home_type says otherwise.
+ZHVI_VARIANTS = (
+    ZhviVariant("all_homes", "City_zhvi_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv"),
+    # The largest file, listed early so it downloads alongside the others.
+    # Only for the towns in ZIP_ROUTES, which have no city series.
+    ZhviVariant("all_homes", "Zip_zhvi_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv", level="zip"),
+    ZhviVariant("single_family", "City_zhvi_uc_sfr_tier_0.33_0.67_sm_sa_month.csv"),
+    ZhviVariant("condo", "City_zhvi_uc_condo_tier_0.33_0.67_sm_sa_month.csv"),
+    ZhviVariant("bedrooms_1", "City_zhvi_bdrmcnt_1_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv"),
+    ZhviVariant("bedrooms_2", "City_zhvi_bdrmcnt_2_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv"),
+    ZhviVariant("bedrooms_3", "City_zhvi_bdrmcnt_3_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv"),
+    ZhviVariant("bedrooms_4", "City_zhvi_bdrmcnt_4_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv"),
+    ZhviVariant("bedrooms_5", "City_zhvi_bdrmcnt_5_uc_sfrcondo_tier_0.33_0.67_sm_sa_month.csv"),
+    ZhviVariant("top_tier", "City_zhvi_uc_sfrcondo_tier_0.67_1.0_sm_sa_month.csv"),
+    ZhviVariant("bottom_tier", "City_zhvi_uc_sfrcondo_tier_0.0_0.33_sm_sa_month.csv"),
 )
 
+# ZIP -> (town_id, weight) for the towns loaded from the ZIP-level file. A
+# weight is the share of the town in that ZIP, so a town's value is the
+# weighted mean of its ZIPs.
+ZIP_ROUTES = {
+    zip_code: routes
+    for zip_code, towns in ZIP_TO_TOWNS.items()
+    if (routes := tuple(route for route in towns if route[0] in ZILLOW_ZIP_TOWN_IDS))
+}
+
+# Files downloaded and parsed at once
+FETCH_CONCURRENCY = 4
+
+# Batches sent to Supabase in parallel
+UPSERT_CONCURRENCY = 4
+
+# Incremental runs parse the months from this many months before the latest
+# stored date onwards, so Zillow's revisions of recent months land too
+REVISION_WINDOW_MONTHS = 6
+
+NJ_STATE_NAMES = ("NJ", "New Jersey")
+
+# Matches an NJ StateName field (see shared.field_filter). Any line without
+# one cannot be an NJ row, so it is dropped before decoding.
+NJ_STATE_FIELD = field_pattern(NJ_STATE_NAMES, ",")
+
 
 def parse_date_columns(headers: list[str]) -> list[str]:
     """Extract date column headers (YYYY-MM-DD format)."""
@@ -37,67 +124,349 @@ def parse_date_columns(headers: list[str]) -> list[str]:
     return date_cols
 
 
-@lambda_handler_wrapper
-def handler(event, context):
-    logger.info("Downloading Zillow ZHVI City-level CSV")
-    req = urllib.request.Request(ZHVI_CITY_URL, headers={"User-Agent": "MiniAppETL/1.0"})
-    with urllib.request.urlopen(req, timeout=120) as resp:
-        text = resp.read().decode("utf-8")
+class ZhviMatrix:
+    """
+    ZHVI values of the matched towns in columnar form: one row per town and
+    one column per date, in a flat row-major array('d') with NaN for cells
+    Zillow left blank.
+
+    A row's cells are converted in a single map(float) pass instead of a
+    strip/try/float per cell, and derived series (month-over-month,
+    year-over-year) can be computed over the same matrix.
+    """
+
+    def __init__(self, dates: Sequence[str]):
+        self.dates = list(dates)
+        self.town_ids: list[str] = []
+        self.values = array("d")
+
+    def __len__(self) -> int:
+        return len(self.town_ids)
+
+    def add_row(self, town_id: str, cells: Sequence[str]) -> None:
+        """Append a town's cells, in `dates` order."""
+        self.append(town_id, parse_cells(cells))
+
+    def append(self, town_id: str, values: array) -> None:
+        """Append a town's already converted values, in `dates` order."""
+        self.town_ids.append(town_id)
+        self.values.extend(values)
+
+    def row(self, i: int) -> array:
+        width = len(self.dates)
+        return self.values[i * width : (i + 1) * width]
+
+    def melt(self, home_type: str) -> Iterator[dict]:
+        """Yield a zhvi_values row for every non-NaN cell, town by town."""
+        for i, town_id in enumerate(self.town_ids):
+            for date, value in zip(self.dates, self.row(i), strict=True):
+                if not math.isnan(value):
+                    yield {
+                        "town_id": town_id,
+                        "date": date,
+                        "zhvi_value": value,
+                        "home_type": home_type,
+                    }
+
+
+class WeightedTownMeans:
+    """
+    Running weighted means of ZIP-level rows per town, one column per date.
+
+    Each ZIP row is folded into its towns' sums as it is read, so memory is two
+    arrays per town however many rows stream past. A ZIP blank in some month
+    drops out of that month's mean instead of counting as zero.
+    """
+
+    def __init__(self, dates: Sequence[str]):
+        self.dates = list(dates)
+        self._sums: dict[str, tuple[array, array]] = {}
+
+    def add(self, town_id: str, weight: float, values: array) -> None:
+        """Fold one ZIP's values, in `dates` order, into a town's means."""
+        if town_id not in self._sums:
+            zeros = array("d", [0.0]) * len(self.dates)
+            self._sums[town_id] = (zeros, array("d", zeros))
+        weighted, weights = self._sums[town_id]
+        for i, value in enumerate(values):
+            if not math.isnan(value):
+                weighted[i] += weight * value
+                weights[i] += weight
+
+    def matrix(self) -> ZhviMatrix:
+        """The means so far, NaN for months no ZIP of the town has a value."""
+        matrix = ZhviMatrix(self.dates)
+        for town_id in sorted(self._sums):
+            weighted, weights = self._sums[town_id]
+            means = (
+                round(total / weight, 2) if weight else math.nan
+                for total, weight in zip(weighted, weights, strict=True)
+            )
+            matrix.append(town_id, array("d", means))
+        return matrix
+
 
-    logger.info(f"Downloaded {len(text)} bytes")
+def parse_cells(cells: Sequence[str]) -> array:
+    """Convert ZHVI cells to doubles, NaN for blank or malformed cells."""
+    try:
+        # float() ignores surrounding whitespace; blanks become NaN
+        return array("d", map(float, [cell or "nan" for cell in cells]))
+    except ValueError:
+        return array("d", map(_parse_cell, cells))
 
-    reader = csv.DictReader(io.StringIO(text))
-    headers = list(reader.fieldnames or [])
+
+def _parse_cell(cell: str) -> float:
+    try:
+        return float(cell)
+    except ValueError:
+        return math.nan
+
+
+def fetch_watermark(revision_months: int, home_type: str) -> tuple[str | None, set[str]]:
+    """
+    Start of the revision window before the latest stored date of a home_type,
+    and the towns with values inside it. (None, empty set) if nothing is stored.
+    """
+    newest = query(
+        "zhvi_values",
+        select="date",
+        filters=f"home_type=eq.{home_type}&order=date.desc&limit=1",
+    )
+    if not newest:
+        return None, set()
+
+    year, month = int(newest[0]["date"][:4]), int(newest[0]["date"][5:7])
+    months = year * 12 + month - 1 - revision_months
+    since = f"{months // 12:04d}-{months % 12 + 1:02d}-01"
+    # (town_id, date) is unique within a home_type, so pages are keyset-paginated
+    rows = iter_query(
+        "zhvi_values",
+        select="town_id,date",
+        filters=f"home_type=eq.{home_type}&date=gte.{since}",
+        order="town_id,date",
+    )
+    return since, {row["town_id"] for row in rows}
+
+
+class ParsedZhvi(NamedTuple):
+    """The NJ towns of one ZHVI file."""
+
+    date_cols: list[str]
+    # Towns with stored values in the revision window, window columns only
+    matrix: ZhviMatrix
+    # Towns with nothing stored in the window, every column
+    backfill: ZhviMatrix
+    unmatched_nj: set[str]
+
+    def rows(self, home_type: str) -> Iterator[dict]:
+        return itertools.chain(self.matrix.melt(home_type), self.backfill.melt(home_type))
+
+
+def read_header(lines: BinaryIO) -> list[str]:
+    """Read and check the header line of a ZHVI CSV stream."""
+    headers = next(csv.reader([lines.readline().decode("utf-8")]))
+    missing = [col for col in ("RegionName", "StateName") if col not in headers]
+    if missing:
+        raise ValueError(f"Zillow header is missing expected columns: {missing}")
+    # NJ_STATE_FIELD expects a comma on both sides of the field
+    inner_column(headers, "StateName", "Zillow")
+    return headers
+
+
+def parse_zhvi(lines: BinaryIO, since: str | None, stored_towns: set[str]) -> ParsedZhvi:
+    """
+    Read a city-level ZHVI CSV stream, keeping NJ towns and, for towns in
+    stored_towns, only the date columns from `since` on (all columns when
+    since is None).
+    """
+    headers = read_header(lines)
     date_cols = parse_date_columns(headers)
-    logger.info(f"Found {len(date_cols)} date columns (from {date_cols[0]} to {date_cols[-1]})")
+    state_pos = headers.index("StateName")
+    name_pos = headers.index("RegionName")
 
-    rows = []
-    matched_towns = set()
-    skipped_nj = []
+    # Older months are never extracted or converted; towns with nothing
+    # stored in the window go to a full-width backfill matrix instead
+    recent_cols = [d for d in date_cols if d >= since] if since else date_cols
+    recent_positions = [headers.index(date_col) for date_col in recent_cols]
+    all_positions = [headers.index(date_col) for date_col in date_cols]
+    parsed = ParsedZhvi(date_cols, ZhviMatrix(recent_cols), ZhviMatrix(date_cols), set())
 
-    for record in reader:
-        state = record.get("StateName", "")
-        if state != "NJ" and state != "New Jersey":
+    for fields in candidate_records(lines, NJ_STATE_FIELD, ","):
+        if len(fields) < len(headers) or fields[state_pos] not in NJ_STATE_NAMES:
             continue
 
-        city = record.get("RegionName", "").strip()
+        city = fields[name_pos].strip()
         town_id = ZILLOW_NAME_TO_ID.get(city.lower())
 
         if not town_id:
-            skipped_nj.append(city)
+            parsed.unmatched_nj.add(city)
             continue
 
-        matched_towns.add(town_id)
-
-        for date_col in date_cols:
-            value = record.get(date_col, "").strip()
-            if not value:
-                continue
-            try:
-                zhvi_value = float(value)
-            except ValueError:
-                continue
-
-            rows.append(
-                {
-                    "town_id": town_id,
-                    "date": date_col,
-                    "zhvi_value": zhvi_value,
-                    "home_type": "all_homes",
-                }
+        if since is None or town_id in stored_towns:
+            parsed.matrix.add_row(town_id, [fields[position] for position in recent_positions])
+        else:
+            parsed.backfill.add_row(town_id, [fields[position] for position in all_positions])
+    return parsed
+
+
+def parse_zhvi_zips(lines: BinaryIO, since: str | None, stored_towns: set[str]) -> ParsedZhvi:
+    """
+    Read a ZIP-level ZHVI CSV stream into weighted town means over ZIP_ROUTES,
+    with the same column windows as parse_zhvi. NJ ZIPs outside the crosswalk
+    are expected (most of the state) and not reported.
+    """
+    headers = read_header(lines)
+    date_cols = parse_date_columns(headers)
+    state_pos = headers.index("StateName")
+    zip_pos = headers.index("RegionName")
+
+    recent_cols = [d for d in date_cols if d >= since] if since else date_cols
+    recent_positions = [headers.index(date_col) for date_col in recent_cols]
+    all_positions = [headers.index(date_col) for date_col in date_cols]
+    recent, backfill = WeightedTownMeans(recent_cols), WeightedTownMeans(date_cols)
+
+    for fields in candidate_records(lines, NJ_STATE_FIELD, ","):
+        if len(fields) < len(headers) or fields[state_pos] not in NJ_STATE_NAMES:
+            continue
+        # Some Zillow exports drop the leading zero of NJ ZIPs
+        routes = ZIP_ROUTES.get(fields[zip_pos].strip().zfill(5))
+        if not routes:
+            continue
+
+        # A ZIP shared by towns is converted once per column window
+        recent_values = all_values = None
+        for town_id, weight in routes:
+            if since is None or town_id in stored_towns:
+                if recent_values is None:
+                    recent_values = parse_cells([fields[position] for position in recent_positions])
+                recent.add(town_id, weight, recent_values)
+            else:
+                if all_values is None:
+                    all_values = parse_cells([fields[position] for position in all_positions])
+                backfill.add(town_id, weight, all_values)
+    return ParsedZhvi(date_cols, recent.matrix(), backfill.matrix(), set())
+
+
+def load_variant(
+    variant: ZhviVariant, sources: SourceCache, watermark: tuple[str | None, set[str]]
+) -> ParsedZhvi | None:
+    """Download and parse one variant; None if its file has not changed."""
+    logger.info(f"Downloading Zillow ZHVI {variant.name}: {variant.file}")
+    resp = sources.open(variant.url, timeout=120)
+    if resp is None:
+        return None
+    parse = parse_zhvi_zips if variant.level == "zip" else parse_zhvi
+    with resp:
+        parsed = parse(resp, *watermark)
+    logger.info(
+        f"Parsed {variant.name}: {len(parsed.matrix)} rows x "
+        f"{len(parsed.matrix.dates)} months, {len(parsed.backfill)} backfill rows"
+    )
+    return parsed
+
+
+@lambda_handler_wrapper
+def handler(event, context):
+    event = event if isinstance(event, dict) else {}
+    full_refresh = bool(event.get("full_refresh", False))
+    revision_months = int(event.get("revision_months", REVISION_WINDOW_MONTHS))
+    sources = SourceCache(force=full_refresh or bool(event.get("force_fetch", False)))
+
+    home_types = event.get("variants") or [variant.home_type for variant in ZHVI_VARIANTS]
+    unknown = sorted(set(home_types) - {variant.home_type for variant in ZHVI_VARIANTS})
+    if unknown:
+        raise ValueError(f"Unknown ZHVI variants: {unknown}")
+    variants = [variant for variant in ZHVI_VARIANTS if variant.home_type in home_types]
+
+    parsed: dict[str, ParsedZhvi | None] = {}
+    data_points: dict[str, int] = {}
+
+    watermarks: list[tuple[str | None, set[str]]]
+    with ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY) as pool:
+        if full_refresh:
+            logger.info("Full refresh: loading every month")
+            watermarks = [(None, set())] * len(variants)
+        else:
+            watermarks = list(
+                pool.map(lambda v: fetch_watermark(revision_months, v.home_type), variants)
             )
 
-    logger.info(f"Matched {len(matched_towns)} towns, {len(rows)} data points")
-    if skipped_nj:
-        logger.info(f"Unmatched NJ cities in Zillow: {sorted(set(skipped_nj))}")
+        # A full refresh rewrites every row; otherwise skip rows already up to
+        # date, comparing only against stored rows in the earliest window
+        sinces = [since for since, _ in watermarks if since]
+        loaded_types = dict.fromkeys(variant.home_type for variant in variants)
+        delta_filters = f"home_type=in.({','.join(loaded_types)})"
+        if len(sinces) == len(watermarks):
+            delta_filters += f"&date=gte.{min(sinces)}"
+
+        with UpsertStream(
+            "zhvi_values",
+            on_conflict="town_id,date,home_type",
+            max_concurrency=UPSERT_CONCURRENCY,
+            adaptive=True,
+            wire_format="csv",
+            delta=not full_refresh,
+            delta_filters=delta_filters,
+        ) as sink:
+            futures = {
+                pool.submit(load_variant, variant, sources, watermark): variant
+                for variant, watermark in zip(variants, watermarks, strict=True)
+            }
+            # Rows go to the shared stream from this thread as each file finishes
+            for future in as_completed(futures):
+                variant = futures[future]
+                loaded = parsed[variant.name] = future.result()
+                data_points[variant.name] = 0
+                if loaded is None:
+                    continue
+                for row in loaded.rows(variant.home_type):
+                    sink.write(row)
+                    data_points[variant.name] += 1
+
+    if all(result is None for result in parsed.values()):
+        return {"unchanged": True}
+    result = sink.result
+    sources.commit()
+
+    matched_towns: set[str] = set()
+    unmatched_nj: set[str] = set()
+    by_variant: dict[str, dict[str, Any]] = {}
+    for variant, (since, _) in zip(variants, watermarks, strict=True):
+        name = variant.name
+        variant_parsed = parsed[name]
+        if variant_parsed is None:
+            by_variant[name] = {"unchanged": True}
+            continue
+        towns = {*variant_parsed.matrix.town_ids, *variant_parsed.backfill.town_ids}
+        matched_towns |= towns
+        unmatched_nj |= variant_parsed.unmatched_nj
+        date_cols = variant_parsed.date_cols
+        by_variant[name] = {
+            "towns_matched": len(towns),
+            "data_points": data_points[name],
+            "date_range": f"{date_cols[0]} to {date_cols[-1]}" if date_cols else "none",
+        }
+        if not full_refresh:
+            by_variant[name]["since"] = since
+            by_variant[name]["towns_backfilled"] = sorted(variant_parsed.backfill.town_ids)
 
-    result = upsert("zhvi_values", rows, on_conflict="town_id,date,home_type")
+    logger.info(
+        f"Matched {len(matched_towns)} towns, {sum(data_points.values())} data points "
+        f"across {len(variants)} ZHVI variants"
+    )
+    if unmatched_nj:
+        logger.info(f"Unmatched NJ cities in Zillow: {sorted(unmatched_nj)}")
 
-    return {
+    summary = {
         "towns_matched": len(matched_towns),
         "towns_matched_list": sorted(matched_towns),
-        "data_points": len(rows),
-        "date_range": f"{date_cols[0]} to {date_cols[-1]}" if date_cols else "none",
-        "unmatched_nj_cities": sorted(set(skipped_nj)),
+        "data_points": sum(data_points.values()),
+        "unmatched_nj_cities": sorted(unmatched_nj),
+        "full_refresh": full_refresh,
+        "variants": by_variant,
         "upserted": result["inserted"],
+        "rows_unchanged": result.get("unchanged", 0),
     }
+    if not full_refresh:
+        summary["revision_months"] = revision_months
+    return summary
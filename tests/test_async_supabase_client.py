@@ -0,0 +1,155 @@
+"""The asyncio client's HTTP/1.1 exchange against a scripted local server."""
+
+import asyncio
+
+from shared.async_supabase_client import _AsyncConnectionPool
+
+
+def _response(body: bytes, *headers: str, status: str = "200 OK") -> bytes:
+    head = "\r\n".join([f"HTTP/1.1 {status}", *headers])
+    return f"{head}\r\n\r\n".encode("latin-1") + body
+
+
+def _chunked(*chunks: bytes) -> bytes:
+    out = b"".join(b"%x;ext=1\r\n%s\r\n" % (len(c), c) for c in chunks)
+    return out + b"0\r\n\r\n"
+
+
+async def _serve(responses: list[bytes], close_after: frozenset[int] = frozenset()):
+    """
+    Answer each request with the next scripted response.
+
+    Returns the server and a list recording the connection number each
+    request arrived on. Connections are closed after a response whose index
+    is in close_after, or once the script is exhausted.
+    """
+    seen: list[int] = []
+    connections = 0
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        nonlocal connections
+        connections += 1
+        conn_num = connections
+        try:
+            while responses:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = next(
+                    int(line.split(b":")[1])
+                    for line in head.split(b"\r\n")
+                    if line.lower().startswith(b"content-length:")
+                )
+                await reader.readexactly(length)
+                seen.append(conn_num)
+                writer.write(responses.pop(0))
+                await writer.drain()
+                if len(seen) - 1 in close_after:
+                    break
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, seen
+
+
+def _url(server, path: str = "/rest/v1/t") -> str:
+    port = server.sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}{path}"
+
+
+def test_content_length_keep_alive_reuses_connection():
+    async def run():
+        server, seen = await _serve(
+            [
+                _response(b'[{"a": 1}]', "Content-Length: 10"),
+                _response(b"[]", "Content-Length: 2", "Content-Range: */0"),
+            ]
+        )
+        pool = _AsyncConnectionPool()
+        async with server:
+            first = await pool.request("GET", _url(server))
+            second = await pool.request("POST", _url(server), b'[{"a": 1}]')
+        return first, second, seen, pool.stats
+
+    first, second, seen, stats = asyncio.run(run())
+    assert (first.status, first.body) == (200, b'[{"a": 1}]')
+    assert second.headers["content-range"] == "*/0"
+    assert seen == [1, 1]
+    assert stats == {"opened": 1, "reused": 1, "reconnected": 0}
+
+
+def test_chunked_body_is_reassembled_and_connection_kept():
+    async def run():
+        server, seen = await _serve(
+            [
+                _response(_chunked(b'[{"a": ', b"1}", b"]"), "Transfer-Encoding: chunked"),
+                _response(b"[]", "Content-Length: 2"),
+            ]
+        )
+        pool = _AsyncConnectionPool()
+        async with server:
+            first = await pool.request("GET", _url(server))
+            second = await pool.request("GET", _url(server))
+        return first, second, seen
+
+    first, second, seen = asyncio.run(run())
+    assert first.body == b'[{"a": 1}]'
+    assert second.body == b"[]"
+    assert seen == [1, 1]
+
+
+def test_connection_close_is_not_reused():
+    async def run():
+        server, seen = await _serve(
+            [
+                _response(b"[]", "Content-Length: 2", "Connection: close"),
+                _response(b"[1]", "Content-Length: 3"),
+            ],
+            close_after=frozenset({0}),
+        )
+        pool = _AsyncConnectionPool()
+        async with server:
+            await pool.request("GET", _url(server))
+            second = await pool.request("GET", _url(server))
+        return second, seen, pool.stats
+
+    second, seen, stats = asyncio.run(run())
+    assert second.body == b"[1]"
+    assert seen == [1, 2]
+    assert stats == {"opened": 2, "reused": 0, "reconnected": 0}
+
+
+def test_body_without_length_reads_to_eof():
+    async def run():
+        server, _ = await _serve([_response(b'{"message": "bad"}', status="400 Bad Request")])
+        pool = _AsyncConnectionPool()
+        async with server:
+            resp = await pool.request("GET", _url(server))
+        return resp, pool._idle
+
+    resp, idle = asyncio.run(run())
+    assert (resp.status, resp.body) == (400, b'{"message": "bad"}')
+    assert not any(idle.values())
+
+
+def test_parked_connection_closed_by_server_reconnects():
+    async def run():
+        # The server drops the keep-alive connection after the first response
+        server, seen = await _serve(
+            [
+                _response(b"[]", "Content-Length: 2"),
+                _response(b"[2]", "Content-Length: 3"),
+            ],
+            close_after=frozenset({0}),
+        )
+        pool = _AsyncConnectionPool()
+        async with server:
+            await pool.request("GET", _url(server))
+            await asyncio.sleep(0.05)
+            second = await pool.request("GET", _url(server))
+        return second, seen, pool.stats
+
+    second, seen, stats = asyncio.run(run())
+    assert second.body == b"[2]"
+    assert seen == [1, 2]
+    assert stats == {"opened": 2, "reused": 1, "reconnected": 1}
@@ -0,0 +1,78 @@
+"""SpillingDeduper must agree with a plain last-wins dict, spilled or not."""
+
+import random
+
+import pytest
+
+from shared import dedupe
+from shared.dedupe import SpillingDeduper
+
+COLUMNS = ("town_id", "date", "home_type", "value", "count")
+
+
+@pytest.fixture(autouse=True)
+def spill_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dedupe, "SPILL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _rows(n, seed=3):
+    rng = random.Random(seed)
+    towns = [f"town-{i}" for i in range(40)]
+    dates = [f"2025-{m:02d}-01" for m in range(1, 13)]
+    for _ in range(n):
+        yield (
+            rng.choice(towns),
+            rng.choice(dates),
+            rng.choice(["all_homes", "condo", None]),
+            None if rng.random() < 0.1 else round(rng.uniform(1e5, 1e6), 2),
+            None if rng.random() < 0.1 else rng.randrange(0, 500),
+        )
+
+
+def _expected(rows):
+    latest = {}
+    for row in rows:
+        latest[row[:2]] = dict(zip(COLUMNS, row, strict=True))
+    return latest
+
+
+@pytest.mark.parametrize("memory_budget", [64 * 1024 * 1024, 2_000, 20_000])
+def test_matches_plain_dict(memory_budget):
+    rows = list(_rows(5_000))
+    with SpillingDeduper(
+        COLUMNS,
+        key=("town_id", "date"),
+        strings=("town_id", "date", "home_type"),
+        int_columns=("count",),
+        memory_budget=memory_budget,
+    ) as deduper:
+        for row in rows:
+            deduper.add(row)
+        expected = _expected(rows)
+        assert deduper.finish() == len(expected)
+        # Iterable more than once, with the same contents each time
+        for _ in range(2):
+            got = {(row["town_id"], row["date"]): row for row in deduper}
+            assert got == expected
+        if memory_budget < 64 * 1024 * 1024:
+            assert deduper.spills > 1
+
+
+def test_close_removes_spill_files(spill_dir):
+    deduper = SpillingDeduper(
+        COLUMNS, key=("town_id", "date"), strings=("town_id", "date", "home_type"), memory_budget=1
+    )
+    for row in _rows(100):
+        deduper.add(row)
+    deduper.finish()
+    assert any(spill_dir.iterdir())
+    deduper.close()
+    assert not any(spill_dir.iterdir())
+
+
+def test_add_after_finish_raises():
+    deduper = SpillingDeduper(COLUMNS, key=("town_id",), strings=("town_id", "date", "home_type"))
+    deduper.finish()
+    with pytest.raises(RuntimeError):
+        deduper.add(next(_rows(1)))
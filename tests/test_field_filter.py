@@ -0,0 +1,37 @@
+"""The raw-bytes prefilter must keep every line csv.reader would keep."""
+
+import csv
+
+import pytest
+
+from shared.field_filter import candidate_records, field_pattern, inner_column
+
+LINES = [
+    b"1,Fort Lee,NJ,Bergen County,100",
+    b'2,Hoboken,"New Jersey",Hudson County,200',
+    b'3,"Austin, TX",TX,Travis,300',
+    b"4,New Jersey Ave,TX,Travis,400",
+    b'5,"Newark, NJ",NY,Kings,500',
+    b"6,Jersey City,NJX,Hudson County,600",
+]
+
+
+def test_candidates_are_a_superset_of_exact_matches():
+    pattern = field_pattern(("NJ", "New Jersey"), ",")
+    records = list(candidate_records(LINES, pattern, ","))
+
+    exact = [r for r in csv.reader(line.decode() for line in LINES) if r[2] in ("NJ", "New Jersey")]
+    assert [r for r in records if r[2] in ("NJ", "New Jersey")] == exact
+    assert [r[0] for r in records] == ["1", "2"]
+
+
+def test_tab_delimited_fields():
+    pattern = field_pattern(frozenset({"NJ", "NY"}), "\t")
+    lines = [b"a\tNJ\tx", b'b\t"NY"\tx', b"c\tCT\tx", b"d NJ x"]
+    assert [r[0] for r in candidate_records(lines, pattern, "\t")] == ["a", "b"]
+
+
+def test_inner_column():
+    assert inner_column(["id", "StateName", "value"], "StateName", "Zillow") == 1
+    with pytest.raises(ValueError, match="Zillow StateName column is not between"):
+        inner_column(["id", "value", "StateName"], "StateName", "Zillow")
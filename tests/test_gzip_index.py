@@ -0,0 +1,95 @@
+"""Random-access reads through a gzip index must match a plain gzip.open pass."""
+
+import gzip
+import random
+
+import pytest
+
+from shared.gzip_index import INDEX_AVAILABLE, GzipIndexBuilder
+
+pytestmark = pytest.mark.skipif(not INDEX_AVAILABLE, reason="system libz not available")
+
+SPAN = 64 * 1024
+
+
+@pytest.fixture(scope="module")
+def gz_path(tmp_path_factory):
+    rng = random.Random(7)
+    lines = [
+        f"{i}\t{rng.choice(['Newark', 'Princeton', 'Hoboken'])}\t{rng.random():.6f}\t"
+        + "x" * rng.randrange(0, 200)
+        for i in range(40_000)
+    ]
+    path = tmp_path_factory.mktemp("gz") / "tracker.tsv.gz"
+    path.write_bytes(gzip.compress("\n".join(lines).encode("utf-8") + b"\n"))
+    return path
+
+
+def _build(path, chunk_size=7919):
+    builder = GzipIndexBuilder(span=SPAN)
+    out = []
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            out.extend(builder.feed(chunk))
+    return builder.finish(), b"".join(out)
+
+
+def _opener(path):
+    def open_at(offset):
+        f = open(path, "rb")  # noqa: SIM115 - closed by iter_from
+        f.seek(offset)
+        return f
+
+    return open_at
+
+
+def test_builder_output_matches_gzip(gz_path):
+    index, out = _build(gz_path)
+    with gzip.open(gz_path, "rb") as f:
+        expected = f.read()
+    assert out == expected
+    assert index is not None
+    assert index.length == len(expected)
+    assert len(index.points) > 10
+
+
+def test_iter_from_every_point(gz_path):
+    index, _ = _build(gz_path)
+    with gzip.open(gz_path, "rb") as f:
+        expected = f.read()
+    open_at = _opener(gz_path)
+    for i, point in enumerate(index.points):
+        assert b"".join(index.iter_from(i, open_at)) == expected[point.out_offset :]
+
+
+@pytest.mark.parametrize("n", [1, 3, 8])
+def test_segments_yield_every_line_once(gz_path, n):
+    index, _ = _build(gz_path)
+    with gzip.open(gz_path, "rb") as f:
+        expected = f.read().split(b"\n")[:-1]
+    open_at = _opener(gz_path)
+    lines = [
+        line for first, last in index.segments(n) for line in index.iter_lines(first, last, open_at)
+    ]
+    assert lines == expected
+
+
+def test_resumed_builder_matches_gzip(gz_path):
+    index, _ = _build(gz_path)
+    with gzip.open(gz_path, "rb") as f:
+        expected = f.read()
+    point = index.points[len(index.points) // 2]
+    builder = GzipIndexBuilder(span=SPAN, start=point)
+    out = []
+    with _opener(gz_path)(point.in_offset - (1 if point.bits else 0)) as f:
+        while chunk := f.read(4096):
+            out.extend(builder.feed(chunk))
+    assert b"".join(out) == expected[point.out_offset :]
+
+
+def test_multi_member_file_is_not_indexed(tmp_path):
+    path = tmp_path / "two.gz"
+    path.write_bytes(gzip.compress(b"a\n") + gzip.compress(b"b\n"))
+    index, out = _build(path)
+    assert out == b"a\nb\n"
+    assert index is None
@@ -0,0 +1,84 @@
+"""UpsertStream bookkeeping: checkpointed positions and delta skips."""
+
+import pytest
+
+from shared import checkpoint, supabase_client
+from shared.checkpoint import UpsertCheckpoint
+from shared.supabase_client import UpsertStream
+
+COLUMNS = ["town_id", "date", "value"]
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def posted(monkeypatch):
+    """Capture posted batches instead of sending them."""
+    batches: list[int] = []
+
+    def fake_post_batch(table, url, headers, data, n_rows, batch_num, compress, **kwargs):
+        batches.append(n_rows)
+        return n_rows
+
+    monkeypatch.setattr(supabase_client, "_post_batch", fake_post_batch)
+    return batches
+
+
+def _rows(n):
+    return [{"town_id": f"town-{i}", "date": "2025-01-01", "value": i} for i in range(n)]
+
+
+def _existing(monkeypatch, rows):
+    fingerprints = {
+        (row["town_id"], row["date"]): supabase_client._fingerprint(row, ["value"]) for row in rows
+    }
+    monkeypatch.setattr(supabase_client, "fetch_fingerprints", lambda *args: fingerprints)
+
+
+def test_checkpoint_skips_committed_positions(posted):
+    rows = _rows(25)
+    with UpsertStream(
+        "t", on_conflict="town_id,date", batch_size=10, checkpoint=UpsertCheckpoint("t")
+    ) as sink:
+        sink.write_many(rows)
+    assert posted == [10, 10, 5]
+
+    posted.clear()
+    with UpsertStream(
+        "t", on_conflict="town_id,date", batch_size=10, checkpoint=UpsertCheckpoint("t")
+    ) as sink:
+        sink.write_many(rows)
+    assert posted == []
+    assert sink.result["resumed"] == 25
+
+
+def test_delta_marks_unchanged_tail_committed(monkeypatch, posted):
+    rows = _rows(30)
+    # The first 10 rows are new and fill a batch; the last 20 are stored unchanged
+    _existing(monkeypatch, rows[10:])
+    ck = UpsertCheckpoint("t")
+    with UpsertStream(
+        "t", on_conflict="town_id,date", batch_size=10, checkpoint=ck, delta=True
+    ) as sink:
+        sink.write_many(rows)
+    assert posted == [10]
+    assert sink.result["new"] == 10
+    assert sink.result["unchanged"] == 20
+    assert ck.committed_rows == 30
+    assert UpsertCheckpoint("t").committed_rows == 30
+
+
+def test_delta_all_unchanged_marks_everything_committed(monkeypatch, posted):
+    rows = _rows(12)
+    _existing(monkeypatch, rows)
+    ck = UpsertCheckpoint("t")
+    with UpsertStream(
+        "t", on_conflict="town_id,date", batch_size=5, checkpoint=ck, delta=True
+    ) as sink:
+        sink.write_many(rows)
+    assert posted == []
+    assert ck.committed_rows == 12